@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Symbolic derivation of the direct geometric models and the jacobians used in
+robots.py. The closed-form expressions written in robots.py have been derived
+by hand from the output of this script.
+
+Requires sympy, which is not needed to run the controllers.
+"""
+
+import sympy as sp
+
+
+def rot_x(a):
+    c, s = sp.cos(a), sp.sin(a)
+    return sp.Matrix([[1, 0, 0, 0], [0, c, -s, 0], [0, s, c, 0], [0, 0, 0, 1]])
+
+
+def rot_z(a):
+    c, s = sp.cos(a), sp.sin(a)
+    return sp.Matrix([[c, -s, 0, 0], [s, c, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]])
+
+
+def translation(x, y, z):
+    return sp.Matrix([[1, 0, 0, x], [0, 1, 0, y], [0, 0, 1, z], [0, 0, 0, 1]])
+
+
+def robotRT():
+    q0, q1 = sp.symbols("q0 q1")
+    L0, L1, L2, W = sp.symbols("L0 L1 L2 W", positive=True)
+    T = (translation(0, 0, L0 + W/2) @ rot_z(q0) @
+         translation(L1, 0, 0) @ translation(q1, 0, 0) @
+         translation(0, -L2, 0) @ rot_z(sp.pi))
+    return sp.Matrix(T[:2, 3]), [q0, q1]
+
+
+def robotRRR():
+    q0, q1, q2 = sp.symbols("q0 q1 q2")
+    L0, L1, L2, L3 = sp.symbols("L0 L1 L2 L3", positive=True)
+    T = (translation(0, 0, L0) @ rot_z(q0) @
+         translation(0, L1, 0) @ rot_x(q1) @
+         translation(0, L2, 0) @ rot_x(q2) @
+         translation(0, L3, 0))
+    return sp.Matrix(T[:3, 3]), [q0, q1, q2]
+
+
+def legRobot():
+    q0, q1, q2, q3 = sp.symbols("q0 q1 q2 q3")
+    L0, L1, L2, L3, L4, W = sp.symbols("L0 L1 L2 L3 L4 W", positive=True)
+    T = (translation(0, 0, L0) @ rot_z(q0) @
+         translation(W, L1, 0) @ rot_x(q1) @
+         translation(-W, L2, 0) @ rot_x(q2) @
+         translation(W, L3, 0) @ rot_x(q3) @
+         translation(0, L4, 0))
+    return sp.Matrix([T[0, 3], T[1, 3], T[2, 3], T[2, 1]]), [q0, q1, q2, q3]
+
+
+if __name__ == "__main__":
+    for name, builder in [("RobotRT", robotRT), ("RobotRRR", robotRRR), ("LegRobot", legRobot)]:
+        mgd, joints = builder()
+        mgd = sp.simplify(mgd)
+        jacobian = sp.simplify(mgd.jacobian(joints))
+        print(f"{name}:")
+        for i, expr in enumerate(mgd):
+            print(f"\tMGD[{i}] = {expr}")
+        for j in range(len(joints)):
+            for i in range(mgd.shape[0]):
+                print(f"\tJ[{i}, {j}] = {jacobian[i, j]}")
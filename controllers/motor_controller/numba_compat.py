@@ -0,0 +1,8 @@
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional, functions are simply interpreted without it
+    def njit(*args, **kwargs):
+        def decorator(f):
+            return f
+        return decorator
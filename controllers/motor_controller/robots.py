@@ -1,9 +1,251 @@
 import numpy as np
 from abc import abstractmethod
 import homogeneous_transform as ht
+import functools
 import math
 from scipy import optimize
 
+from numba_compat import njit
+
+
+@njit(cache=True, fastmath=True)
+def _cosine_law(x, y, L1, L2, out):
+    """
+    Writes the solutions of cosineLaw in the rows of out (shape(2,2)) and
+    returns the number of solutions
+    """
+    dist = math.sqrt(x*x + y*y)
+    if (dist < abs(L1 - L2)) or dist > (L1 + L2):
+        return 0
+    phi = math.atan2(y, x)
+    alpha = math.acos((L1*L1 + dist*dist - L2*L2) / (2*L1*dist))
+    beta = math.acos((L1*L1 + L2*L2 - dist*dist) / (2*L1*L2))
+    out[0, 0] = phi + alpha
+    out[0, 1] = beta - math.pi
+    tol = 1e-9  # Only consider 1 solution if alpha is too small
+    if abs(alpha) > tol:
+        out[1, 0] = phi - alpha
+        out[1, 1] = math.pi - beta
+        return 2
+    return 1
+
+
+@njit(cache=True, fastmath=True)
+def _rt_mgd(L1, L2, q0, q1):
+    c0 = math.cos(q0)
+    s0 = math.sin(q0)
+    r = L1 + q1
+    pos = np.empty(2)
+    pos[0] = r * c0 + L2 * s0
+    pos[1] = r * s0 - L2 * c0
+    return pos
+
+
+# The *_mgd_jac functions compute the MGD and the jacobian in a single pass,
+# they return the MGD and write the jacobian in the provided J array
+@njit(cache=True, fastmath=True)
+def _rt_mgd_jac(L1, L2, q0, q1, J):
+    c0 = math.cos(q0)
+    s0 = math.sin(q0)
+    r = L1 + q1
+    pos = np.empty(2)
+    pos[0] = r * c0 + L2 * s0
+    pos[1] = r * s0 - L2 * c0
+    J[0, 0] = -r * s0 + L2 * c0
+    J[1, 0] = r * c0 + L2 * s0
+    J[0, 1] = c0
+    J[1, 1] = s0
+    return pos
+
+
+@njit(cache=True, fastmath=True)
+def _rrr_mgd(L0, L1, L2, L3, q0, q1, q2):
+    q12 = q1 + q2
+    # Distance to z-axis and elevation of the tool in the plane of the arm
+    r = L1 + L2 * math.cos(q1) + L3 * math.cos(q12)
+    h = L2 * math.sin(q1) + L3 * math.sin(q12)
+    pos = np.empty(3)
+    pos[0] = -r * math.sin(q0)
+    pos[1] = r * math.cos(q0)
+    pos[2] = L0 + h
+    return pos
+
+
+@njit(cache=True, fastmath=True)
+def _rrr_mgd_jac(L0, L1, L2, L3, q0, q1, q2, J):
+    c0 = math.cos(q0)
+    s0 = math.sin(q0)
+    q12 = q1 + q2
+    y2 = L3 * math.cos(q12)
+    z2 = L3 * math.sin(q12)
+    y1 = L2 * math.cos(q1) + y2
+    z1 = L2 * math.sin(q1) + z2
+    r = L1 + y1
+    pos = np.empty(3)
+    pos[0] = -r * s0
+    pos[1] = r * c0
+    pos[2] = L0 + z1
+    J[0, 0] = -r * c0
+    J[1, 0] = -r * s0
+    J[2, 0] = 0.0
+    J[0, 1] = z1 * s0
+    J[1, 1] = -z1 * c0
+    J[2, 1] = y1
+    J[0, 2] = z2 * s0
+    J[1, 2] = -z2 * c0
+    J[2, 2] = y2
+    return pos
+
+
+@njit(cache=True, fastmath=True)
+def _rrr_mgi(L0, L1, L2, L3, x, y, z, out):
+    """
+    Writes the candidate solutions of RobotRRR.analyticalMGI in the rows of
+    out (shape(4,3)) and returns the number of solutions
+    """
+    tol = 1e-9  # Below this distance to the z-axis, q0 is arbitrary
+    theta = 0.0
+    if math.hypot(x, y) >= tol:
+        theta = math.atan2(y, x) - math.pi/2
+    # Z in referential 2 does not depend on q0
+    z_in_2a = z - L0
+    q12 = np.empty((2, 2))
+    nb_solutions = 0
+    for q0 in (theta, theta + math.pi):
+        # Put target in the proper referential, equivalent to
+        # inv(T_1_2) @ rot_z(-q0) @ inv(T_0_1) @ target, only Y is affected by q0
+        y_in_2a = -math.sin(q0) * x + math.cos(q0) * y - L1
+        nb_q12 = _cosine_law(y_in_2a, z_in_2a, L2, L3, q12)
+        for i in range(nb_q12):
+            out[nb_solutions, 0] = q0
+            out[nb_solutions, 1] = q12[i, 0]
+            out[nb_solutions, 2] = q12[i, 1]
+            nb_solutions += 1
+    return nb_solutions
+
+
+@njit(cache=True, fastmath=True)
+def _leg_mgd(L0, L1, L2, L3, L4, W, q0, q1, q2, q3):
+    q12 = q1 + q2
+    q123 = q12 + q3
+    y = L1 + L2 * math.cos(q1) + L3 * math.cos(q12) + L4 * math.cos(q123)
+    z = L2 * math.sin(q1) + L3 * math.sin(q12) + L4 * math.sin(q123)
+    c0 = math.cos(q0)
+    s0 = math.sin(q0)
+    pos = np.empty(4)
+    pos[0] = W * c0 - y * s0
+    pos[1] = W * s0 + y * c0
+    pos[2] = L0 + z
+    pos[3] = math.sin(q123)
+    return pos
+
+
+@njit(cache=True, fastmath=True)
+def _leg_mgd_jac(L0, L1, L2, L3, L4, W, q0, q1, q2, q3, J):
+    c0 = math.cos(q0)
+    s0 = math.sin(q0)
+    q12 = q1 + q2
+    q123 = q12 + q3
+    # Contributions of links [i:] to the distance along y and z in the
+    # referential following q0
+    y3 = L4 * math.cos(q123)
+    z3 = L4 * math.sin(q123)
+    y2 = L3 * math.cos(q12) + y3
+    z2 = L3 * math.sin(q12) + z3
+    y1 = L2 * math.cos(q1) + y2
+    z1 = L2 * math.sin(q1) + z2
+    r = L1 + y1
+    c123 = math.cos(q123)
+    pos = np.empty(4)
+    pos[0] = W * c0 - r * s0
+    pos[1] = W * s0 + r * c0
+    pos[2] = L0 + z1
+    pos[3] = math.sin(q123)
+    J[0, 0] = -r * c0 - W * s0
+    J[1, 0] = -r * s0 + W * c0
+    J[2, 0] = 0.0
+    J[3, 0] = 0.0
+    J[0, 1] = z1 * s0
+    J[1, 1] = -z1 * c0
+    J[2, 1] = y1
+    J[3, 1] = c123
+    J[0, 2] = z2 * s0
+    J[1, 2] = -z2 * c0
+    J[2, 2] = y2
+    J[3, 2] = c123
+    J[0, 3] = z3 * s0
+    J[1, 3] = -z3 * c0
+    J[2, 3] = y3
+    J[3, 3] = c123
+    return pos
+
+
+@njit(cache=True, fastmath=True)
+def _inv2(A):
+    """
+    Returns the determinant of the 2x2 matrix A and its inverse from the
+    cofactors, the inverse is left uninitialized if A is singular
+    """
+    inv = np.empty((2, 2))
+    det = A[0, 0] * A[1, 1] - A[0, 1] * A[1, 0]
+    if abs(det) < 1e-12:
+        return det, inv
+    inv[0, 0] = A[1, 1] / det
+    inv[0, 1] = -A[0, 1] / det
+    inv[1, 0] = -A[1, 0] / det
+    inv[1, 1] = A[0, 0] / det
+    return det, inv
+
+
+@njit(cache=True, fastmath=True)
+def _inv3(A):
+    """
+    Returns the determinant of the 3x3 matrix A and its inverse from the
+    cofactors, the inverse is left uninitialized if A is singular
+    """
+    inv = np.empty((3, 3))
+    c00 = A[1, 1] * A[2, 2] - A[1, 2] * A[2, 1]
+    c01 = A[1, 2] * A[2, 0] - A[1, 0] * A[2, 2]
+    c02 = A[1, 0] * A[2, 1] - A[1, 1] * A[2, 0]
+    det = A[0, 0] * c00 + A[0, 1] * c01 + A[0, 2] * c02
+    if abs(det) < 1e-12:
+        return det, inv
+    inv[0, 0] = c00 / det
+    inv[1, 0] = c01 / det
+    inv[2, 0] = c02 / det
+    inv[0, 1] = (A[0, 2] * A[2, 1] - A[0, 1] * A[2, 2]) / det
+    inv[1, 1] = (A[0, 0] * A[2, 2] - A[0, 2] * A[2, 0]) / det
+    inv[2, 1] = (A[0, 1] * A[2, 0] - A[0, 0] * A[2, 1]) / det
+    inv[0, 2] = (A[0, 1] * A[1, 2] - A[0, 2] * A[1, 1]) / det
+    inv[1, 2] = (A[0, 2] * A[1, 0] - A[0, 0] * A[1, 2]) / det
+    inv[2, 2] = (A[0, 0] * A[1, 1] - A[0, 1] * A[1, 0]) / det
+    return det, inv
+
+
+def solveSmallSystem(A, b):
+    """
+    Solves A x = b, using closed-form inverses for 2x2 and 3x3 matrices which
+    avoid the overhead of LAPACK on tiny systems
+
+    Parameters
+    ----------
+    A : np.ndarray shape(n,n)
+    b : np.ndarray shape(n,)
+
+    Returns
+    -------
+    x : np.ndarray shape(n,)
+    """
+    if A.shape[0] == 2:
+        det, inv = _inv2(A)
+    elif A.shape[0] == 3:
+        det, inv = _inv3(A)
+    else:
+        return np.linalg.solve(A, b)
+    if abs(det) < 1e-12:
+        return np.linalg.solve(A, b)
+    return inv @ b
+
 
 def cosineLaw(x, y, L1, L2):
     """
@@ -16,22 +258,19 @@ def cosineLaw(x, y, L1, L2):
 
     Returns
     -------
-    solutions : list((double,double))
-        The list of couples (alpha, beta) that allows to reach the provided
-        target
+    solutions : np.ndarray shape(k,2) with k in {0,1,2}
+        The couples (alpha, beta) that allows to reach the provided target,
+        one per row
     """
-    solutions = []
-    dist = math.sqrt(x**2+y**2)
-    if (dist < abs(L1 - L2)) or dist > (L1 + L2):
-        return solutions
-    phi = math.atan2(y, x)
-    alpha = math.acos((L1**2+dist**2-L2**2) / (2*L1*dist))
-    beta = math.acos((L1**2+L2**2-dist**2) / (2*L1*L2))
-    solutions.append(np.array([phi+alpha, beta - np.pi]))
-    tol = 1e-9  # Only consider 1 solution if alpha is too small
-    if abs(alpha) > tol:
-        solutions.append(np.array([phi-alpha, np.pi - beta]))
-    return solutions
+    out = np.empty((2, 2))
+    nb_solutions = _cosine_law(float(x), float(y), float(L1), float(L2), out)
+    return out[:nb_solutions]
+
+
+def _read_only(array):
+    """Mark array as read-only before sharing it between calls"""
+    array.flags.writeable = False
+    return array
 
 
 class RobotModel:
@@ -78,7 +317,8 @@ class RobotModel:
         -------
         np.array
             The values limits for the robot joints, each row is a different
-            joint, column 0 is min, column 1 is max
+            joint, column 0 is min, column 1 is max. The array is read-only and
+            shared between calls
         """
 
     @abstractmethod
@@ -129,12 +369,15 @@ class RobotModel:
         """
 
     @abstractmethod
-    def computeJacobian(self, joints):
+    def computeJacobian(self, joints, out=None):
         """
         Parameters
         ----------
         joints : np.array
             The values of the joints of the robot in joint space
+        out : None or np.ndarray shape(m,n)
+            If provided, the jacobian is written into this array instead of a
+            new one
 
         Returns
         -------
@@ -142,6 +385,55 @@ class RobotModel:
             The jacobian of the robot for given joints values
         """
 
+    def computeMGDAndJacobian(self, joints, out=None):
+        """
+        Parameters
+        ----------
+        joints : np.array
+            The values of the joints of the robot in joint space
+        out : None or np.ndarray shape(m,n)
+            If provided, the jacobian is written into this array instead of a
+            new one, see computeJacobian
+
+        Returns
+        -------
+        pos : np.array
+            The coordinate of the effectors in the operational space, see
+            computeMGD
+        J : np.array
+            The jacobian of the robot, see computeJacobian
+        """
+        return self.computeMGD(joints), self.computeJacobian(joints, out)
+
+    @abstractmethod
+    def computeMGDBatch(self, joints):
+        """
+        Parameters
+        ----------
+        joints : np.ndarray shape(B,n)
+            One joints configuration per row
+
+        Returns
+        -------
+        np.ndarray shape(B,m)
+            The coordinate of the effectors in the operational space for each
+            configuration
+        """
+
+    @abstractmethod
+    def computeJacobianBatch(self, joints):
+        """
+        Parameters
+        ----------
+        joints : np.ndarray shape(B,n)
+            One joints configuration per row
+
+        Returns
+        -------
+        np.ndarray shape(B,m,n)
+            The jacobian of the robot for each configuration
+        """
+
     @abstractmethod
     def analyticalMGI(self, target):
         """
@@ -162,7 +454,8 @@ class RobotModel:
             target. If no solution is available, returns None.
         """
 
-    def computeMGI(self, joints, target, method, max_steps=50, seed=None):
+    def computeMGI(self, joints, target, method, max_steps=50, seed=None, warm_start=False,
+                   last_joints=None, optimizer="SLSQP"):
         """
         Parameters
         ----------
@@ -177,17 +470,66 @@ class RobotModel:
             - jacobianTransposed
         seed : None or int
             The seed used for inner random components if needed
+        warm_start : bool
+            For iterative methods, start from the candidate with the lowest
+            error among joints, the analytical solution and last_joints, see
+            selectInitialJoints
+        last_joints : None or np.ndarray shape(n,)
+            A previous solution kept by the caller, e.g. the one of the last
+            target, only used with warm_start
+        optimizer : str
+            The optimizer of the jacobianTransposed method, see
+            solveJacTransposed
         """
         if method == "analyticalMGI":
             nb_sols, sol = self.analyticalMGI(target)
-            return sol
-        elif method == "jacobianInverse":
-            return self.solveJacInverse(joints, target, max_steps=max_steps, seed=seed)
-        elif method == "jacobianTransposed":
-            return self.solveJacTransposed(joints, target, max_epochs=max_steps, seed=seed)
-        raise RuntimeError("Unknown method: " + method)
+        elif method in ["jacobianInverse", "jacobianTransposed"]:
+            if warm_start:
+                joints = self.selectInitialJoints(joints, target, last_joints)
+            if method == "jacobianInverse":
+                sol = self.solveJacInverse(joints, target, max_steps=max_steps, seed=seed)
+            else:
+                sol = self.solveJacTransposed(joints, target, max_epochs=max_steps, seed=seed,
+                                              optimizer=optimizer)
+        else:
+            raise RuntimeError("Unknown method: " + method)
+        return sol
 
-    def solveJacInverse(self, joints, target, max_steps=500, tol=1e-6, seed=None):
+    def selectInitialJoints(self, joints, target, last_joints=None):
+        """
+        Parameters
+        ----------
+        joints : np.ndarray shape(n,)
+            The current position of joints in angular space
+        target : np.ndarray shape(m,)
+            The target in operational space
+        last_joints : None or np.ndarray shape(n,)
+            A previous solution provided by the caller
+
+        Returns
+        -------
+        joints : np.ndarray shape(n,)
+            Among joints, the solution of analyticalMGI (if any) and last_joints
+            (if any), the configuration with the lowest distance to target in
+            operational space
+        """
+        candidates = [np.asarray(joints, dtype=np.double)]
+        nb_sols, sol = self.analyticalMGI(target)
+        if sol is not None:
+            candidates.append(np.asarray(sol, dtype=np.double))
+        if last_joints is not None:
+            candidates.append(np.asarray(last_joints, dtype=np.double))
+        best_joints = None
+        best_error = None
+        for candidate in candidates:
+            error = target - self.computeMGD(candidate)
+            error = math.sqrt(error @ error)
+            if best_error is None or error < best_error:
+                best_joints = candidate
+                best_error = error
+        return best_joints
+
+    def solveJacInverse(self, joints, target, max_steps=500, tol=1e-6, damping=1e-3, seed=None):
         """
         Parameters
         ----------
@@ -197,39 +539,152 @@ class RobotModel:
             The wished target for the tool in operational space
         max_steps: int
             The maximal number of steps allowed
+        damping: float
+            The damping factor lambda of the Levenberg-Marquardt update
+            $J^T(JJ^T + \\lambda^2 I)^{-1} e$, it keeps the steps bounded near
+            singular configurations
         seed: None or int
-            Since the method comport some random part, the seed can be specified
-            to obtain reproductible results.
+            When the error has not improved by at least 0.1% for 20 consecutive
+            steps (e.g. the error is orthogonal to the image of the jacobian),
+            joints are randomized, the seed can be specified to obtain
+            reproductible results.
         """
         max_step_size = 0.05
+        stall_steps = 20
+        min_improvement = 1e-3
+        damping_matrix = damping**2 * np.eye(target.shape[0])
         rng = np.random.default_rng(seed)
+        best_error_norm = math.inf
+        nb_stalled = 0
+        # The jacobian is written into the same array at every step
+        J_buf = np.empty((target.shape[0], joints.shape[0]))
         for i in range(max_steps):
-            pos = self.computeMGD(joints)
+            pos, J = self.computeMGDAndJacobian(joints, out=J_buf)
             error = target - pos
-            if np.linalg.norm(error) < tol:
+            error_norm = math.sqrt(error @ error)
+            if error_norm < tol:
+                break
+            if error_norm < best_error_norm * (1 - min_improvement):
+                best_error_norm = error_norm
+                nb_stalled = 0
+            else:
+                nb_stalled += 1
+                if nb_stalled >= stall_steps:
+                    noise_level = 1e-1
+                    joints = joints + rng.uniform(-noise_level, noise_level, joints.shape[0])
+                    best_error_norm = math.inf
+                    nb_stalled = 0
+                    continue
+            step = J.transpose() @ solveSmallSystem(J @ J.transpose() + damping_matrix, error)
+            step_size = math.sqrt(step @ step)
+            if step_size > max_step_size:
+                step = step / step_size * max_step_size
+            joints = joints + step
+        return joints
+
+    def solveJacInverseBatch(self, joints, targets, max_steps=500, tol=1e-6, damping=1e-3, seed=None):
+        """
+        Batched version of solveJacInverse, the damped least-squares steps of
+        all the unconverged rows are solved at once.
+
+        Parameters
+        ----------
+        joints: np.ndarray shape(B,n)
+            The initial positions for the search in angular space, one per row
+        targets: np.ndarray shape(B,m)
+            The wished targets for the tool in operational space, one per row
+        max_steps: int
+            The maximal number of steps allowed
+        damping: float
+            The damping factor lambda, see solveJacInverse
+        seed: None or int
+            The seed used to randomize the stalled rows, see solveJacInverse
+
+        Returns
+        -------
+        joints: np.ndarray shape(B,n)
+            The final position of each search in angular space
+        """
+        joints = np.array(joints, dtype=np.double)
+        targets = np.asarray(targets, dtype=np.double)
+        max_step_size = 0.05
+        damping_matrix = damping**2 * np.eye(targets.shape[1])
+        stall_steps = 20
+        min_improvement = 1e-3
+        rng = np.random.default_rng(seed)
+        best_error_norm = np.full(joints.shape[0], np.inf)
+        nb_stalled = np.zeros(joints.shape[0], dtype=int)
+        active = np.arange(joints.shape[0])
+        for i in range(max_steps):
+            q = joints[active]
+            error = targets[active] - self.computeMGDBatch(q)
+            error_norm = np.linalg.norm(error, axis=1)
+            converged = error_norm < tol
+            improved = error_norm < best_error_norm[active] * (1 - min_improvement)
+            best_error_norm[active] = np.where(improved, error_norm, best_error_norm[active])
+            nb_stalled[active] = np.where(improved, 0, nb_stalled[active] + 1)
+            stalled = ~converged & (nb_stalled[active] >= stall_steps)
+            J = self.computeJacobianBatch(q)
+            J_T = J.transpose(0, 2, 1)
+            step = (J_T @ np.linalg.solve(J @ J_T + damping_matrix, error[..., None]))[..., 0]
+            step_size = np.linalg.norm(step, axis=1)
+            too_large = step_size > max_step_size
+            step[too_large] *= (max_step_size / step_size[too_large])[:, None]
+            noise_level = 1e-1
+            step[stalled] = rng.uniform(-noise_level, noise_level, (np.count_nonzero(stalled), joints.shape[1]))
+            best_error_norm[active[stalled]] = np.inf
+            nb_stalled[active[stalled]] = 0
+            joints[active[~converged]] += step[~converged]
+            active = active[~converged]
+            if active.size == 0:
                 break
-            try:
-                J_inv = np.linalg.inv(self.computeJacobian(joints))
-                step = J_inv @ error
-                step_size = np.linalg.norm(step)
-                if step_size > max_step_size:
-                    step = step / step_size * max_step_size
-                joints = joints + step
-            except np.linalg.LinAlgError:
-                noise_level = 1e-1
-                random_offset = rng.uniform(-noise_level, noise_level, joints.shape[0])
-                print(f'LinAlgError: randomizing by {random_offset}')
-                joints = joints + random_offset
         return joints
 
-    def solveJacTransposed(self, joints, target, max_epochs=10, max_iterations=500, seed=None):
+    def solveJacTransposed(self, joints, target, max_epochs=10, max_iterations=500, seed=None,
+                           optimizer="SLSQP"):
+        """
+        Parameters
+        ----------
+        joints: np.ndarray shape(n,)
+            The initial position for the search in angular space
+        target: np.ndarray shape(m,)
+            The wished target for the tool in operational space
+        max_epochs: int
+            The maximal number of calls to the optimizer, joints are randomized
+            between epochs if they did not change
+        max_iterations: int
+            The maximal number of iterations of the optimizer for each epoch
+        seed: None or int
+            The seed used to randomize joints
+        optimizer: str
+            The bound-constrained method of scipy.optimize.minimize used, e.g.
+            "SLSQP" or "L-BFGS-B". L-BFGS-B iterations are cheaper but it does
+            not converge on every target, e.g. for RobotRRR from [0, 0.2, 0] to
+            [0.6, -0.2, 1.2] it ends 0.27 away while SLSQP reaches the target.
+        """
         limits = self.getJointsLimits()
+        bounds = optimize.Bounds(limits[:, 0], limits[:, 1])
+        # The optimizer requests cost and jacobian at the same x, the last
+        # MGD is kept to compute it only once
+        last_mgd = [None, None]
+
+        def mgd(x):
+            if last_mgd[0] is None or not np.array_equal(last_mgd[0], x):
+                last_mgd[0] = np.array(x, dtype=np.double)
+                last_mgd[1] = self.computeMGD(x)
+            return last_mgd[1]
 
         def cost_func(x):
-            return np.linalg.norm(self.computeMGD(x) - target, 2)
+            error = mgd(x) - target
+            return math.sqrt(error @ error)
 
         def jac_func(x):
-            return - 2 * (self.computeJacobian(x).transpose() @ (target - self.computeMGD(x)))
+            # Gradient of the distance |e|: J^T e / |e|
+            error = mgd(x) - target
+            dist = math.sqrt(error @ error)
+            if dist == 0:
+                return np.zeros(len(x))
+            return self.computeJacobian(x).transpose() @ error / dist
         tol_cost = 10**-4
         tol_joints = 10 ** -3
         min_improvement = tol_cost * 10**-2
@@ -242,7 +697,8 @@ class RobotModel:
             print(f'Epoch {epoch:3d}:\n\tjoints: {joints}\n\tcost: {cost_func(joints):.5f}')
             # If change of joints was low, add noise
             if last_joints is not None:
-                joint_diff = np.linalg.norm(last_joints-joints)
+                joints_offset = last_joints - joints
+                joint_diff = math.sqrt(joints_offset @ joints_offset)
                 cost_diff = cost - last_cost
                 if joint_diff < tol_joints and cost_diff < min_improvement:
                     noise_level = 1e-1
@@ -251,8 +707,8 @@ class RobotModel:
                     print('randomizing joints')
             res = optimize.minimize(cost_func, joints,
                                     jac=jac_func,
-                                    bounds=optimize.Bounds(limits[:, 0], limits[:, 1]),
-                                    method="SLSQP",
+                                    bounds=bounds,
+                                    method=optimizer,
                                     options={"maxiter": max_iterations})
             epoch += 1
             last_joints = joints
@@ -275,53 +731,70 @@ class RobotRT(RobotModel):
         self.L2 = 0.25 + self.W/2  # Distance including the offset
         self.max_q1 = 0.25
         self.T_0_1 = ht.translation([0, 0, self.L0+self.W/2])
-        self.T_1_2 = ht.translation([self.L1, 0, 0])
         self.T_2_E = ht.translation([0.0, -self.L2, 0]) @ ht.rot_z(np.pi)
+        self._limits = _read_only(np.array([[-np.pi, np.pi], [0, 0.55]], dtype=np.double))
+        self._min_dist_sq = self.L1**2 + self.L2**2
+        self._max_dist_sq = (self.L1 + self.max_q1)**2 + self.L2**2
 
     def getJointsNames(self):
         return ["q1", "q2"]
 
     def getJointsLimits(self):
-        return np.array([[-np.pi, np.pi], [0, 0.55]], dtype=np.double)
+        return self._limits
 
     def getOperationalDimensionNames(self):
         return ["x", "y"]
 
     def getOperationalDimensionLimits(self):
-        max_dist = np.sqrt((self.L1+self.max_q1)**2 + self.L2**2)
+        max_dist = math.sqrt(self._max_dist_sq)
         return np.array([[-1, 1],  [-1, 1]]) * max_dist
 
     def getBaseFromToolTransform(self, joints):
         T_0_1 = self.T_0_1 @ ht.rot_z(joints[0])
-        T_1_2 = self.T_1_2 @ ht.translation(joints[1] * np.array([1, 0, 0]))
-        return T_0_1 @ T_1_2 @ self.T_2_E
+        T_1_E = ht.translation([self.L1 + joints[1], 0, 0]) @ self.T_2_E
+        return T_0_1 @ T_1_E
 
     def computeMGD(self, q):
-        tool_pos = self.getBaseFromToolTransform(q) @ np.array([0, 0, 0, 1])
-        return tool_pos[:2]
+        return _rt_mgd(self.L1, self.L2, float(q[0]), float(q[1]))
 
     def analyticalMGI(self, target):
-        dist = np.linalg.norm(target)
-        min_dist = np.sqrt(self.L1**2 + self.L2**2)
-        max_dist = np.sqrt((self.L1 + self.max_q1)**2 + self.L2**2)
-        if dist < min_dist or dist > max_dist:
+        # Reachability is checked on squared distances
+        dist_sq = float(target[0])**2 + float(target[1])**2
+        if dist_sq < self._min_dist_sq or dist_sq > self._max_dist_sq:
             return 0, None
         # Using basic geometry to get distance of joint q1
-        q1 = np.sqrt(dist**2 - self.L2**2) - self.L1
+        q1 = math.sqrt(dist_sq - self.L2**2) - self.L1
         dir_to_target = math.atan2(target[1], target[0])
         dir_offset = math.atan2(self.L2, self.L1+q1)
         q0 = dir_to_target + dir_offset
         return 1, np.array([q0, q1])
 
-    def computeJacobian(self, joints):
-        J = np.zeros((2, 2), dtype=np.double)
-        # Derivation by joint[i] + picking up (x,y) from 4x4 matrix
-        J[:, 0] = (self.T_0_1 @ ht.d_rot_z(joints[0]) @ self.T_1_2 @
-                   ht.translation(joints[1] * np.array([1, 0, 0])) @ self.T_2_E)[:2, 3]
-        J[:, 1] = (self.T_0_1 @ ht.rot_z(joints[0]) @ self.T_1_2 @
-                   ht.d_translation(np.array([1, 0, 0])) @ self.T_2_E)[:2, 3]
+    def computeJacobian(self, joints, out=None):
+        return self.computeMGDAndJacobian(joints, out)[1]
+
+    def computeMGDBatch(self, joints):
+        c0 = np.cos(joints[:, 0])
+        s0 = np.sin(joints[:, 0])
+        r = self.L1 + joints[:, 1]
+        return np.stack((r * c0 + self.L2 * s0, r * s0 - self.L2 * c0), axis=1)
+
+    def computeJacobianBatch(self, joints):
+        c0 = np.cos(joints[:, 0])
+        s0 = np.sin(joints[:, 0])
+        r = self.L1 + joints[:, 1]
+        J = np.empty((len(joints), 2, 2))
+        J[:, 0, 0] = -r * s0 + self.L2 * c0
+        J[:, 1, 0] = r * c0 + self.L2 * s0
+        J[:, 0, 1] = c0
+        J[:, 1, 1] = s0
         return J
 
+    def computeMGDAndJacobian(self, joints, out=None):
+        # Closed form derivation, see jacobian_derivation.py
+        J = np.empty((2, 2)) if out is None else out
+        pos = _rt_mgd_jac(self.L1, self.L2, float(joints[0]), float(joints[1]), J)
+        return pos, J
+
 
 class RobotRRR(RobotModel):
     """
@@ -337,12 +810,13 @@ class RobotRRR(RobotModel):
         self.T_1_2 = ht.translation([0, self.L1, 0])
         self.T_2_3 = ht.translation([0.0, self.L2, 0])
         self.T_3_E = ht.translation([0.0, self.L3, 0])
+        self._limits = _read_only(np.tile([-np.pi, np.pi], (3, 1)))
 
     def getJointsNames(self):
         return ["q1", "q2", "q3"]
 
     def getJointsLimits(self):
-        return np.array([[-np.pi, np.pi], [-np.pi, np.pi], [-np.pi, np.pi]], dtype=np.double)
+        return self._limits
 
     def getOperationalDimensionNames(self):
         return ["x", "y", "z"]
@@ -360,49 +834,62 @@ class RobotRRR(RobotModel):
         return T_0_1 @ T_1_2 @ T_2_3 @ self.T_3_E
 
     def computeMGD(self, q):
-        tool_pos = self.getBaseFromToolTransform(q) @ np.array([0, 0, 0, 1])
-        return tool_pos[:3]
+        return _rrr_mgd(self.L0, self.L1, self.L2, self.L3, float(q[0]), float(q[1]), float(q[2]))
 
     def analyticalMGI(self, target):
         # When X and Y of target are 'almost' zero, there is an infinity of solutions
-        tol = 1e-9  # Only consider 1 solution if alpha is too small
-        singularity = np.linalg.norm(target[:2]) < tol
-        # First: use q0 to align target along y-axis:
-        # - There's 2 potential solutions:
-        theta = 0
-        if not singularity:
-            theta = math.atan2(target[1], target[0]) - np.pi/2
-        solutions = []
-        for q0 in [theta, theta + np.pi]:
-            target_in_0 = np.zeros(4, dtype=np.double)
-            target_in_0[:3] = target
-            target_in_0[3] = 1
-            # Put target in the proper referential:
-            # only 2 rotations and 2 translations remaining
-            target_in_2a = (ht.invert_transform(self.T_1_2) @ ht.rot_z(-q0) @
-                            ht.invert_transform(self.T_0_1)  @ target_in_0)
-            for q12 in cosineLaw(target_in_2a[1], target_in_2a[2], self.L2, self.L3):
-                solutions.append(np.array([q0, q12[0], q12[1]]))
-        if len(solutions) == 0:
+        tol = 1e-9
+        singularity = math.hypot(target[0], target[1]) < tol
+        solutions = np.empty((4, 3))
+        nb_solutions = _rrr_mgi(self.L0, self.L1, self.L2, self.L3,
+                                float(target[0]), float(target[1]), float(target[2]), solutions)
+        if nb_solutions == 0:
             return 0, None
         if singularity:
             return -1, solutions[0]
-        return len(solutions), solutions[0]
-
-    def computeJacobian(self, joints):
-        J = np.zeros((3, 3), dtype=np.double)
-        # Derivation by joint[i] + picking up (x,y) from 4x4 matrix
-        J[:, 0] = (self.T_0_1 @ ht.d_rot_z(joints[0]) @ self.T_1_2 @
-                   ht.rot_x(joints[1]) @ self.T_2_3 @ ht.rot_x(joints[2]) @
-                   self.T_3_E)[:3, 3]
-        J[:, 1] = (self.T_0_1 @ ht.rot_z(joints[0]) @ self.T_1_2 @
-                   ht.d_rot_x(joints[1]) @ self.T_2_3 @ ht.rot_x(joints[2]) @
-                   self.T_3_E)[:3, 3]
-        J[:, 2] = (self.T_0_1 @ ht.rot_z(joints[0]) @ self.T_1_2 @
-                   ht.rot_x(joints[1]) @ self.T_2_3 @ ht.d_rot_x(joints[2]) @
-                   self.T_3_E)[:3, 3]
+        return nb_solutions, solutions[0]
+
+    def computeJacobian(self, joints, out=None):
+        return self.computeMGDAndJacobian(joints, out)[1]
+
+    def _armBatch(self, joints):
+        """
+        Returns cos(q0), sin(q0) and the contributions of links [1:] and [2:]
+        to the distance along y and z in the referential following q0, see
+        _rrr_mgd_jac, for all the rows of joints
+        """
+        q12 = joints[:, 1] + joints[:, 2]
+        y2 = self.L3 * np.cos(q12)
+        z2 = self.L3 * np.sin(q12)
+        y1 = self.L2 * np.cos(joints[:, 1]) + y2
+        z1 = self.L2 * np.sin(joints[:, 1]) + z2
+        return np.cos(joints[:, 0]), np.sin(joints[:, 0]), y1, z1, y2, z2
+
+    def computeMGDBatch(self, joints):
+        c0, s0, y1, z1, y2, z2 = self._armBatch(joints)
+        r = self.L1 + y1
+        return np.stack((-r * s0, r * c0, self.L0 + z1), axis=1)
+
+    def computeJacobianBatch(self, joints):
+        c0, s0, y1, z1, y2, z2 = self._armBatch(joints)
+        r = self.L1 + y1
+        J = np.empty((len(joints), 3, 3))
+        J[:, 0, 0] = -r * c0
+        J[:, 1, 0] = -r * s0
+        J[:, 2, 0] = 0.0
+        for j, (y, z) in enumerate([(y1, z1), (y2, z2)], start=1):
+            J[:, 0, j] = z * s0
+            J[:, 1, j] = -z * c0
+            J[:, 2, j] = y
         return J
 
+    def computeMGDAndJacobian(self, joints, out=None):
+        # Closed form derivation, see jacobian_derivation.py
+        J = np.empty((3, 3)) if out is None else out
+        pos = _rrr_mgd_jac(self.L0, self.L1, self.L2, self.L3,
+                           float(joints[0]), float(joints[1]), float(joints[2]), J)
+        return pos, J
+
 
 class LegRobot(RobotModel):
     """
@@ -420,16 +907,13 @@ class LegRobot(RobotModel):
         self.T_2_3 = ht.translation([-self.W, self.L2, 0])
         self.T_3_4 = ht.translation([self.W, self.L3, 0])
         self.T_4_E = ht.translation([0, self.L4, 0])
+        self._limits = _read_only(np.tile([-np.pi, np.pi], (4, 1)))
 
     def getJointsNames(self):
         return ["q1", "q2", "q3", "q4"]
 
     def getJointsLimits(self):
-        angle_lim = np.array([-np.pi, np.pi])
-        L = np.zeros((4, 2))
-        for d in range(4):
-            L[d, :] = angle_lim
-        return L
+        return self._limits
 
     def getOperationalDimensionNames(self):
         return ["x", "y", "z", "r32"]
@@ -453,15 +937,16 @@ class LegRobot(RobotModel):
         T : np.arraynd shape(4,4)
            An homogeneous transformation matrix
         """
-        return np.append(T[:3, 3], T[2, 1])
+        return np.array([T[0, 3], T[1, 3], T[2, 3], T[2, 1]])
 
     def computeMGD(self, joints):
-        return self.extractMGD(self.getBaseFromToolTransform(joints))
+        return _leg_mgd(self.L0, self.L1, self.L2, self.L3, self.L4, self.W,
+                        float(joints[0]), float(joints[1]), float(joints[2]), float(joints[3]))
 
     def analyticalMGI(self, target):
         solutions = []
         # Due to the link offset (W), elements near 'z-axis' are unreachable
-        XY_norm = np.linalg.norm(target[:2])
+        XY_norm = math.hypot(target[0], target[1])
         if XY_norm < self.W:
             return 0, None
         # q0 is the only element which can 'align' the direction of the tool
@@ -469,20 +954,23 @@ class LegRobot(RobotModel):
         # doing only atan2(Y,X)
         alpha = math.atan2(target[1], target[0]) - np.pi/2
         beta = math.atan2(self.W, XY_norm)
+        # We also know that sin(q1+q2+q3) = target[3] (aka r_3,2), the two
+        # possible values of q123 and their offsets along L4 do not depend on q0
+        r32_angle = math.asin(target[3])
+        q123_offsets = []
+        for q123 in [r32_angle, np.pi - r32_angle]:
+            q123_offsets.append((q123, math.cos(q123) * self.L4, math.sin(q123) * self.L4))
+        x, y = float(target[0]), float(target[1])
+        Z_in_1 = float(target[2]) - self.L0
         # By symetry we have two solutions, note beta sign changing
         for q0 in [alpha + beta, np.pi + alpha - beta]:
-            # In referential post q1, target should be in [0.02, Y_in_1, Z_in_1]
-            target_pos_in_q0 = np.concatenate((target[:3], [1]))
-            target_pos_in_q1 = ht.rot_z(-q0) @ ht.invert_transform(self.T_0_1) @ target_pos_in_q0
-            Y_in_1 = target_pos_in_q1[1]
-            Z_in_1 = target_pos_in_q1[2]
-            # Now we have aligned the elements, we also know that:
-            # sin(q1+q2+q3) = target[3] (aka r_3,2)
-            alpha = math.asin(target[3])
-            for q123 in [alpha, np.pi - alpha]:
+            # In referential post q1, target should be in [0.02, Y_in_1, Z_in_1],
+            # equivalent to rot_z(-q0) @ inv(T_0_1) @ target
+            Y_in_1 = -math.sin(q0) * x + math.cos(q0) * y
+            for q123, L4_y, L4_z in q123_offsets:
                 # Target origin of 3 in basis 1 is determined by q123
-                Y3_in_1 = Y_in_1 - math.cos(q123) * self.L4
-                Z3_in_1 = Z_in_1 - math.sin(q123) * self.L4
+                Y3_in_1 = Y_in_1 - L4_y
+                Z3_in_1 = Z_in_1 - L4_z
                 q12_solutions = cosineLaw(Y3_in_1 - self.L1, Z3_in_1, self.L2, self.L3)
                 for q12 in q12_solutions:
                     q3 = q123 - q12[0] - q12[1]
@@ -492,39 +980,70 @@ class LegRobot(RobotModel):
             return 0, None
         return nb_sols, solutions[0]
 
-    def computeJacobian(self, joints):
-        J = np.zeros((4, 4), dtype=np.double)
-        J[:, 0] = self.extractMGD(self.T_0_1 @ ht.d_rot_z(joints[0]) @
-                                  self.T_1_2 @ ht.rot_x(joints[1]) @
-                                  self.T_2_3 @ ht.rot_x(joints[2]) @
-                                  self.T_3_4 @ ht.rot_x(joints[3]) @
-                                  self.T_4_E)
-        J[:, 1] = self.extractMGD(self.T_0_1 @ ht.rot_z(joints[0]) @
-                                  self.T_1_2 @ ht.d_rot_x(joints[1]) @
-                                  self.T_2_3 @ ht.rot_x(joints[2]) @
-                                  self.T_3_4 @ ht.rot_x(joints[3]) @
-                                  self.T_4_E)
-        J[:, 2] = self.extractMGD(self.T_0_1 @ ht.rot_z(joints[0]) @
-                                  self.T_1_2 @ ht.rot_x(joints[1]) @
-                                  self.T_2_3 @ ht.d_rot_x(joints[2]) @
-                                  self.T_3_4 @ ht.rot_x(joints[3]) @
-                                  self.T_4_E)
-        J[:, 3] = self.extractMGD(self.T_0_1 @ ht.rot_z(joints[0]) @
-                                  self.T_1_2 @ ht.rot_x(joints[1]) @
-                                  self.T_2_3 @ ht.rot_x(joints[2]) @
-                                  self.T_3_4 @ ht.d_rot_x(joints[3]) @
-                                  self.T_4_E)
+    def computeJacobian(self, joints, out=None):
+        return self.computeMGDAndJacobian(joints, out)[1]
+
+    def _legBatch(self, joints):
+        """
+        Returns cos(q0), sin(q0), q1+q2+q3 and the contributions of links [i:]
+        to the distance along y and z in the referential following q0 for i in
+        1..3, see _leg_mgd_jac, for all the rows of joints
+        """
+        q12 = joints[:, 1] + joints[:, 2]
+        q123 = q12 + joints[:, 3]
+        y3 = self.L4 * np.cos(q123)
+        z3 = self.L4 * np.sin(q123)
+        y2 = self.L3 * np.cos(q12) + y3
+        z2 = self.L3 * np.sin(q12) + z3
+        y1 = self.L2 * np.cos(joints[:, 1]) + y2
+        z1 = self.L2 * np.sin(joints[:, 1]) + z2
+        links = [(y1, z1), (y2, z2), (y3, z3)]
+        return np.cos(joints[:, 0]), np.sin(joints[:, 0]), q123, links
+
+    def computeMGDBatch(self, joints):
+        c0, s0, q123, links = self._legBatch(joints)
+        y1, z1 = links[0]
+        r = self.L1 + y1
+        return np.stack((self.W * c0 - r * s0, self.W * s0 + r * c0, self.L0 + z1, np.sin(q123)), axis=1)
+
+    def computeJacobianBatch(self, joints):
+        c0, s0, q123, links = self._legBatch(joints)
+        r = self.L1 + links[0][0]
+        J = np.empty((len(joints), 4, 4))
+        J[:, 0, 0] = -r * c0 - self.W * s0
+        J[:, 1, 0] = -r * s0 + self.W * c0
+        J[:, 2:, 0] = 0.0
+        c123 = np.cos(q123)
+        for j, (y, z) in enumerate(links, start=1):
+            J[:, 0, j] = z * s0
+            J[:, 1, j] = -z * c0
+            J[:, 2, j] = y
+            J[:, 3, j] = c123
         return J
 
+    def computeMGDAndJacobian(self, joints, out=None):
+        # Closed form derivation, see jacobian_derivation.py
+        J = np.empty((4, 4)) if out is None else out
+        pos = _leg_mgd_jac(self.L0, self.L1, self.L2, self.L3, self.L4, self.W,
+                           float(joints[0]), float(joints[1]), float(joints[2]), float(joints[3]), J)
+        return pos, J
+
+
+_ROBOTS = {
+    "RobotRT": RobotRT,
+    "RobotRRR": RobotRRR,
+    "LegRobot": LegRobot,
+}
 
+
+@functools.lru_cache(maxsize=None)
 def getRobotModel(robot_name):
-    robot = None
-    if robot_name == "RobotRT":
-        robot = RobotRT()
-    elif robot_name == "RobotRRR":
-        robot = RobotRRR()
-    elif robot_name == "LegRobot":
-        robot = LegRobot()
-    else:
+    """
+    Returns the model associated to robot_name, models are built once and the
+    same instance is shared by all the callers requesting the same robot.
+    Models do not keep any state between calls, sharing them is safe.
+    """
+    robot_class = _ROBOTS.get(robot_name)
+    if robot_class is None:
         raise RuntimeError("Unknown robot name: '" + robot_name + "'")
-    return robot
+    return robot_class()
@@ -1,4 +1,4 @@
-from robots import cosineLaw, RobotRT, RobotRRR, LegRobot
+from robots import cosineLaw, solveSmallSystem, getRobotModel, RobotRT, RobotRRR, LegRobot
 
 import unittest
 import numpy as np
@@ -26,9 +26,23 @@ class TestCosineLaw(unittest.TestCase):
             np.testing.assert_allclose(s, expected, rtol, atol)
 
 
-def iterativeTest(robot, initial_pos, target, method, max_steps):
+class TestSolveSmallSystem(unittest.TestCase):
+    def test_solve_small_system(self):
+        rng = np.random.default_rng(44203)
+        for n in [2, 3, 4]:
+            A = rng.uniform(-1, 1, (n, n)) + n * np.eye(n)
+            b = rng.uniform(-1, 1, n)
+            np.testing.assert_allclose(A @ solveSmallSystem(A, b), b, rtol, 1e-9)
+
+    def test_solve_small_system_singular(self):
+        A = np.array([[1.0, 2.0], [2.0, 4.0]])
+        with self.assertRaises(np.linalg.LinAlgError):
+            solveSmallSystem(A, np.array([1.0, 0.0]))
+
+
+def iterativeTest(robot, initial_pos, target, method, max_steps, warm_start=False):
     # Nb iterations can be used to ensure long-term convergence
-    joints = robot.computeMGI(initial_pos, target, method, max_steps=max_steps, seed=44203)
+    joints = robot.computeMGI(initial_pos, target, method, max_steps=max_steps, seed=44203, warm_start=warm_start)
     final_pos = robot.computeMGD(joints)
     print(f'Target: {target}')
     print(f'Final pos: {final_pos}')
@@ -38,6 +52,65 @@ def iterativeTest(robot, initial_pos, target, method, max_steps):
     np.testing.assert_allclose(target, final_pos, rtol, special_atol)
 
 
+def finiteDifferencesTest(robot, nb_configs=10, eps=1e-7):
+    # Compares the jacobian with the derivatives of MGD along each joint
+    rng = np.random.default_rng(44203)
+    limits = robot.getJointsLimits()
+    for _ in range(nb_configs):
+        joints = rng.uniform(limits[:, 0], limits[:, 1])
+        expected = np.zeros((len(robot.computeMGD(joints)), robot.getNbJoints()))
+        for i in range(robot.getNbJoints()):
+            offset = np.zeros(robot.getNbJoints())
+            offset[i] = eps
+            expected[:, i] = (robot.computeMGD(joints + offset) - robot.computeMGD(joints - offset)) / (2 * eps)
+        received = robot.computeJacobian(joints)
+        np.testing.assert_allclose(received, expected, rtol, 1e-6)
+        # Fused computation should provide the same results
+        received_pos, received = robot.computeMGDAndJacobian(joints)
+        np.testing.assert_allclose(received_pos, robot.computeMGD(joints), rtol, 1e-12)
+        np.testing.assert_allclose(received, expected, rtol, 1e-6)
+        # The jacobian can be written into a provided array
+        out = np.empty_like(expected)
+        robot.computeMGDAndJacobian(joints, out=out)
+        np.testing.assert_allclose(out, expected, rtol, 1e-6)
+        out = np.empty_like(expected)
+        robot.computeJacobian(joints, out=out)
+        np.testing.assert_allclose(out, expected, rtol, 1e-6)
+
+
+def batchTest(robot, nb_configs=10):
+    # Batched MGD and jacobian should match the evaluation of each row
+    rng = np.random.default_rng(44203)
+    limits = robot.getJointsLimits()
+    joints = rng.uniform(limits[:, 0], limits[:, 1], (nb_configs, robot.getNbJoints()))
+    expected_pos = np.array([robot.computeMGD(q) for q in joints])
+    expected_J = np.array([robot.computeJacobian(q) for q in joints])
+    np.testing.assert_allclose(robot.computeMGDBatch(joints), expected_pos, rtol, 1e-12)
+    np.testing.assert_allclose(robot.computeJacobianBatch(joints), expected_J, rtol, 1e-12)
+
+
+class TestGetRobotModel(unittest.TestCase):
+    def test_known_robots(self):
+        for name, robot_class in [("RobotRT", RobotRT), ("RobotRRR", RobotRRR), ("LegRobot", LegRobot)]:
+            self.assertIsInstance(getRobotModel(name), robot_class)
+
+    def test_shared_instance(self):
+        self.assertIs(getRobotModel("LegRobot"), getRobotModel("LegRobot"))
+
+    def test_shared_instance_results(self):
+        # Results obtained by a caller are not modified by other callers
+        model = getRobotModel("LegRobot")
+        joints = np.array([0.1, 0.2, 0.3, 0.4])
+        J = model.computeJacobian(joints)
+        expected = J.copy()
+        getRobotModel("LegRobot").computeJacobian(np.zeros(4))
+        np.testing.assert_equal(J, expected)
+
+    def test_unknown_robot(self):
+        with self.assertRaises(RuntimeError):
+            getRobotModel("UnknownRobot")
+
+
 class TestRobotRT(unittest.TestCase):
     @classmethod
     def setUp(self):
@@ -66,6 +139,12 @@ class TestRobotRT(unittest.TestCase):
         expected = np.array([[0.275, 0.3], [1.0, 0.0]]).transpose()
         np.testing.assert_allclose(received, expected, rtol, atol)
 
+    def test_robot_rt_jacobian_finite_differences(self):
+        finiteDifferencesTest(self.model)
+
+    def test_robot_rt_batch(self):
+        batchTest(self.model)
+
     def test_robot_rt_analytical_mgi_config0(self):
         nb_sol, sol = self.model.analyticalMGI(np.array([0.2, -0.275]))
         expected_sol = np.array([0, 0])
@@ -88,6 +167,11 @@ class TestRobotRT(unittest.TestCase):
         # NOTE: if initial pos is [0,0], then the optimization will be stuck
         iterativeTest(self.model, np.array([0, 0.1]), np.array([-0.2, 0.275]), "jacobianTransposed", 10)
 
+    def test_robot_rt_jac_transposed_lbfgsb(self):
+        target = np.array([0.25, 0.3])
+        joints = self.model.solveJacTransposed(np.array([0, 0]), target, seed=44203, optimizer="L-BFGS-B")
+        np.testing.assert_allclose(self.model.computeMGD(joints), target, rtol, 0.005)
+
     def test_robot_rt_analytical_mgi_config1(self):
         # config: [0, 0.2]
         nb_sol, sol = self.model.analyticalMGI(np.array([0.4, -0.275]))
@@ -145,6 +229,12 @@ class TestRRRRobot(unittest.TestCase):
         expected = np.array([[-0.9, 0.0, 0.0], [0.0, -0.325, 0.4], [0.0, -0.325, 0.0]]).transpose()
         np.testing.assert_allclose(received, expected, rtol, atol)
 
+    def test_robot_rrr_jacobian_finite_differences(self):
+        finiteDifferencesTest(self.model)
+
+    def test_robot_rrr_batch(self):
+        batchTest(self.model)
+
     def test_robot_rrr_jac_inverse_long1(self):
         iterativeTest(self.model, np.array([0, 0.1, 0]), np.array([0.0, 0.7, 1.025]), "jacobianInverse", 50000)
 
@@ -154,6 +244,30 @@ class TestRRRRobot(unittest.TestCase):
     def test_robot_rrr_jac_inverse_singularity(self):
         iterativeTest(self.model, np.array([0, 0, 0]), np.array([0.0, -0.7, 1.025]), "jacobianInverse", 50000)
 
+    def test_robot_rrr_jac_inverse_batch(self):
+        initial_pos = np.array([[0, 0.1, 0], [0, 0.2, 0], [0, 0, 0]])
+        targets = np.array([[0.0, 0.7, 1.025], [0.3, -0.5, 1.2], [0.0, -0.7, 1.025]])
+        joints = self.model.solveJacInverseBatch(initial_pos, targets, max_steps=50000, seed=44203)
+        # Rows stop once the error norm is below the default tolerance 1e-6
+        np.testing.assert_allclose(self.model.computeMGDBatch(joints), targets, rtol, 1e-6)
+
+    def test_robot_rrr_warm_start_analytical(self):
+        # Analytical solution is available, a single step is enough
+        iterativeTest(self.model, np.array([0, 0.1, 0]), np.array([0.0, 0.7, 1.025]), "jacobianInverse", 1,
+                      warm_start=True)
+
+    def test_robot_rrr_warm_start_last_joints(self):
+        # Analytical solution is not used for an unreachable target, the
+        # last solution is closer than the provided joints
+        last_joints = self.model.computeMGI(np.array([0, 0.1, 0]), np.array([0.0, 0.7, 1.025]), "analyticalMGI")
+        target = np.array([0.0, 1.3, 1.025])
+        initial_pos = np.array([np.pi, 0, 0])
+        received = self.model.selectInitialJoints(initial_pos, target, last_joints)
+        np.testing.assert_allclose(received, last_joints, rtol, atol)
+        # Without a previous solution, the provided joints are kept
+        received = self.model.selectInitialJoints(initial_pos, target)
+        np.testing.assert_allclose(received, initial_pos, rtol, atol)
+
     def test_robot_rrr_jac_transposed_config1(self):
         iterativeTest(self.model, np.array([0, 0, 0.1]), np.array([0.0, 0.575, 1.025]), "jacobianTransposed", 100)
 
@@ -234,6 +348,13 @@ class TestLegRobot(unittest.TestCase):
     def setUp(self):
         self.model = LegRobot()
 
+    def test_joints_limits_read_only(self):
+        limits = self.model.getJointsLimits()
+        np.testing.assert_allclose(limits, np.tile([-np.pi, np.pi], (4, 1)))
+        self.assertIs(limits, self.model.getJointsLimits())
+        with self.assertRaises(ValueError):
+            limits[0, 0] = 0
+
     def test_leg_operational_limits(self):
         D1 = np.sqrt((0.3 + 0.3 + 0.225)**2 + 0.05**2)
         D2 = np.sqrt((0.5 + 0.3 + 0.3 + 0.225)**2 + 0.05**2)
@@ -286,6 +407,12 @@ class TestLegRobot(unittest.TestCase):
         received = self.model.computeJacobian(joints)
         np.testing.assert_allclose(received, expected, rtol, atol)
 
+    def test_leg_robot_jacobian_finite_differences(self):
+        finiteDifferencesTest(self.model)
+
+    def test_leg_robot_batch(self):
+        batchTest(self.model)
+
     def test_leg_robot_jac_inverse_long0(self):
         iterativeTest(self.model,
                       np.array([0, 0.1, 0, 0]),
@@ -304,12 +431,25 @@ class TestLegRobot(unittest.TestCase):
                       np.array([0.0, 0.7, 0.8, -1.0]),
                       "jacobianInverse", 5000)
 
+    def test_leg_robot_jac_inverse_batch(self):
+        initial_pos = np.array([[0, 0.1, 0, 0], [0, 0.1, 0, 0]])
+        targets = np.array([[0.0, 0.7, 0.8, -1.0], [0.3, 0.5, 1.2, 0.5]])
+        joints = self.model.solveJacInverseBatch(initial_pos, targets, max_steps=5000, seed=44203)
+        # Rows stop once the error norm is below the default tolerance 1e-6
+        np.testing.assert_allclose(self.model.computeMGDBatch(joints), targets, rtol, 1e-6)
+
     def test_leg_robot_jac_transposed_long0(self):
         iterativeTest(self.model,
                       np.array([0, 0.1, 0, 0]),
                       np.array([0.0, 0.7, 0.6, -1.0]),
                       "jacobianTransposed", 50)
 
+    def test_leg_robot_jac_transposed_lbfgsb(self):
+        target = np.array([0.0, 0.7, 0.6, -1.0])
+        joints = self.model.computeMGI(np.array([0, 0.1, 0, 0]), target, "jacobianTransposed",
+                                       max_steps=50, seed=44203, optimizer="L-BFGS-B")
+        np.testing.assert_allclose(self.model.computeMGD(joints), target, rtol, 0.005)
+
     def test_leg_robot_jac_transposed_long1(self):
         iterativeTest(self.model,
                       np.array([0, 0.1, 0, 0]),
@@ -0,0 +1,258 @@
+from trajectories import buildTrajectory, RobotTrajectory
+from robots import RobotRRR
+
+import unittest
+import numpy as np
+import numpy.testing
+
+atol = 1e-9
+# Offset used to evaluate on both sides of a knot
+eps = 1e-7
+
+knots = np.array([[0.0, 1.0], [1.0, 2.0], [1.5, -1.0], [3.0, 0.5], [4.0, 1.0]])
+knots_with_vel = np.array([[0.0, 1.0, 0.0], [1.0, 2.0, 1.0], [1.5, -1.0, -2.0], [3.0, 0.5, 0.0], [4.0, 1.0, 0.5]])
+start = 2.0
+
+
+def checkInterpolation(test_case, trajectory, knots):
+    for t, x in knots[:, :2]:
+        test_case.assertAlmostEqual(trajectory.getVal(start + t, 0), x, delta=atol)
+
+
+def checkContinuity(test_case, trajectory, knots, degrees):
+    for t in knots[1:-1, 0]:
+        for d in degrees:
+            before = trajectory.getVal(start + t - eps, d)
+            after = trajectory.getVal(start + t + eps, d)
+            test_case.assertAlmostEqual(before, after, delta=1e-4)
+
+
+class TestSplines(unittest.TestCase):
+    def test_constant_spline(self):
+        traj = buildTrajectory("ConstantSpline", start, knots)
+        checkInterpolation(self, traj, knots)
+        self.assertEqual(traj.getVal(start + 1.2, 0), 2.0)
+        self.assertEqual(traj.getVal(start + 1.2, 1), 0)
+
+    def test_linear_spline(self):
+        traj = buildTrajectory("LinearSpline", start, knots)
+        checkInterpolation(self, traj, knots)
+        checkContinuity(self, traj, knots, [0])
+        self.assertAlmostEqual(traj.getVal(start + 0.5, 0), 1.5, delta=atol)
+        self.assertAlmostEqual(traj.getVal(start + 0.5, 1), 1.0, delta=atol)
+
+    def test_cubic_zero_derivative_spline(self):
+        traj = buildTrajectory("CubicZeroDerivativeSpline", start, knots)
+        checkInterpolation(self, traj, knots)
+        checkContinuity(self, traj, knots, [0, 1])
+        for t in knots[:, 0]:
+            self.assertAlmostEqual(traj.getVal(start + t + eps, 1), 0, delta=1e-4)
+
+    def test_cubic_custom_derivative_spline(self):
+        traj = buildTrajectory("CubicCustomDerivativeSpline", start, knots_with_vel)
+        checkInterpolation(self, traj, knots_with_vel)
+        checkContinuity(self, traj, knots_with_vel, [0, 1])
+        for t, x, v in knots_with_vel[:-1]:
+            self.assertAlmostEqual(traj.getVal(start + t + eps, 1), v, delta=1e-4)
+
+    def test_cubic_wide_stencil_spline(self):
+        traj = buildTrajectory("CubicWideStencilSpline", start, knots)
+        checkInterpolation(self, traj, knots)
+        checkContinuity(self, traj, knots, [0])
+        # Each slice is the cubic going through 4 consecutive knots
+        p = np.polyfit(knots[1:5, 0], knots[1:5, 1], 3)
+        for t in [1.7, 2.5]:
+            self.assertAlmostEqual(traj.getVal(start + t, 0), np.polyval(p, t), delta=1e-6)
+            self.assertAlmostEqual(traj.getVal(start + t, 1), np.polyval(np.polyder(p), t), delta=1e-6)
+
+    def test_natural_cubic_spline(self):
+        traj = buildTrajectory("NaturalCubicSpline", start, knots)
+        checkInterpolation(self, traj, knots)
+        checkContinuity(self, traj, knots, [0, 1, 2])
+        self.assertAlmostEqual(traj.getVal(start + eps, 2), 0, delta=1e-4)
+        self.assertAlmostEqual(traj.getVal(start + knots[-1, 0] - eps, 2), 0, delta=1e-4)
+
+    def test_periodic_cubic_spline(self):
+        periodic_knots = knots.copy()
+        periodic_knots[-1, 1] = periodic_knots[0, 1]
+        traj = buildTrajectory("PeriodicCubicSpline", start, periodic_knots)
+        checkInterpolation(self, traj, periodic_knots[:-1])
+        checkContinuity(self, traj, periodic_knots, [0, 1, 2])
+        period = periodic_knots[-1, 0]
+        for d in [1, 2]:
+            self.assertAlmostEqual(traj.getVal(start + eps, d), traj.getVal(start + period - eps, d), delta=1e-4)
+        for t in [0.3, 1.2, 3.7]:
+            self.assertAlmostEqual(traj.getVal(start + t, 0), traj.getVal(start + t + 2 * period, 0), delta=atol)
+
+    def test_global_splines_few_knots(self):
+        for nb_knots in [2, 3]:
+            for type_name in ["NaturalCubicSpline", "PeriodicCubicSpline"]:
+                traj = buildTrajectory(type_name, start, knots[:nb_knots])
+                checkInterpolation(self, traj, knots[:nb_knots-1])
+                checkContinuity(self, traj, knots[:nb_knots], [0, 1, 2])
+        traj = buildTrajectory("PeriodicCubicSpline", start, knots[:2])
+        self.assertAlmostEqual(traj.getVal(start + eps, 1), traj.getVal(start + knots[1, 0] - eps, 1), delta=1e-4)
+
+    def test_val_array(self):
+        ts = np.linspace(start - 1, start + 10, 301)
+        for type_name in ["ConstantSpline", "LinearSpline", "CubicZeroDerivativeSpline",
+                          "CubicWideStencilSpline", "NaturalCubicSpline", "PeriodicCubicSpline"]:
+            traj = buildTrajectory(type_name, start, knots)
+            for d in range(4):
+                expected = [traj.getVal(t, d) for t in ts]
+                np.testing.assert_allclose(traj.getValArray(ts, d), expected, atol=atol, err_msg=type_name)
+
+    def test_vals_array(self):
+        ts = np.linspace(start - 1, start + 10, 301)
+        degrees = [2, 0, 1]
+        for type_name in ["LinearSpline", "NaturalCubicSpline", "PeriodicCubicSpline"]:
+            traj = buildTrajectory(type_name, start, knots)
+            values = traj.getValsArray(ts, degrees)
+            self.assertEqual(values.shape, (len(degrees), len(ts)))
+            for i, d in enumerate(degrees):
+                np.testing.assert_allclose(values[i], traj.getValArray(ts, d), atol=atol, err_msg=type_name)
+            for t in [start - 1, start + 0.3, start + 1.0, start + 2.7, start + 10]:
+                expected = tuple(traj.getVal(t, d) for d in degrees)
+                np.testing.assert_allclose(traj.getVals(t, degrees), expected, atol=atol, err_msg=type_name)
+
+    def test_get_polynomial(self):
+        traj = buildTrajectory("NaturalCubicSpline", start, knots)
+        for t in [0.3, 1.0, 1.5, 3.2]:
+            adjusted_t, p = traj.getPolynomial(start + t)
+            # On a knot, the slice starting at this knot is used, as in getVal
+            self.assertAlmostEqual(adjusted_t, t - knots[knots[:, 0] <= t][-1, 0], delta=atol)
+            self.assertAlmostEqual(np.polyval(p[::-1], adjusted_t), traj.getVal(start + t, 0), delta=atol)
+
+    def test_update_polynomials(self):
+        # Evaluations follow knots modified after the construction
+        traj = buildTrajectory("NaturalCubicSpline", start, knots.copy())
+        traj.knots[:, 1] += 1.0
+        traj.knots[-1, 0] += 1.0
+        traj.update()
+        shifted_knots = knots.copy()
+        shifted_knots[:, 1] += 1.0
+        shifted_knots[-1, 0] += 1.0
+        expected = buildTrajectory("NaturalCubicSpline", start, shifted_knots)
+        self.assertEqual(traj.getEnd(), expected.getEnd())
+        ts = np.linspace(start - 1, start + 6, 71)
+        for d in range(3):
+            np.testing.assert_allclose(traj.getValArray(ts, d), expected.getValArray(ts, d), atol=atol)
+            for t in ts:
+                self.assertAlmostEqual(traj.getVal(t, d), expected.getVal(t, d), delta=atol)
+
+    def test_float32_coeffs(self):
+        ts = np.linspace(start, start + 4, 101)
+        traj = buildTrajectory("NaturalCubicSpline", start, knots)
+        traj32 = buildTrajectory("NaturalCubicSpline", start, knots, {"dtype": "float32"})
+        self.assertEqual(traj32.coeffs.dtype, np.float32)
+        for d in range(3):
+            np.testing.assert_allclose(traj32.getValArray(ts, d), traj.getValArray(ts, d), atol=1e-4)
+            self.assertAlmostEqual(traj32.getVal(start + 1.7, d), traj.getVal(start + 1.7, d), delta=1e-4)
+
+    def test_unknown_type(self):
+        with self.assertRaises(RuntimeError):
+            buildTrajectory("UnknownSpline", start, knots)
+        with self.assertRaises(RuntimeError):
+            buildTrajectory("TrapezoidalVelocity", start, np.array([1.0, 3.0]))
+
+    def test_outside_bounds(self):
+        traj = buildTrajectory("NaturalCubicSpline", start, knots)
+        self.assertEqual(traj.getVal(start - 1, 0), knots[0, 1])
+        self.assertEqual(traj.getVal(start + 10, 0), knots[-1, 1])
+        self.assertEqual(traj.getVal(start + 10, 1), 0)
+
+
+class TestTrapezoidalVelocity(unittest.TestCase):
+    def test_bounds(self):
+        traj = buildTrajectory("TrapezoidalVelocity", 0, np.array([1.0, 3.0]), {"vel_max": 1.0, "acc_max": 2.0})
+        self.assertEqual(traj.getVal(-1, 0), 1.0)
+        self.assertEqual(traj.getVal(traj.getEnd() + 1, 0), 3.0)
+        self.assertAlmostEqual(traj.getVal(traj.getEnd(), 0), 3.0, delta=atol)
+        self.assertAlmostEqual(traj.getVal(traj.getEnd() / 2, 1), 1.0, delta=atol)
+
+    def test_start_offset(self):
+        traj = buildTrajectory("TrapezoidalVelocity", start, np.array([1.0, 3.0]), {"vel_max": 1.0, "acc_max": 2.0})
+        self.assertAlmostEqual(traj.getVal(start, 0), 1.0, delta=atol)
+        self.assertAlmostEqual(traj.getVal(start + 0.25, 1), 0.5, delta=atol)
+        self.assertAlmostEqual(traj.getVal((start + traj.getEnd()) / 2, 0), 2.0, delta=atol)
+        self.assertAlmostEqual(traj.getVal(traj.getEnd(), 0), 3.0, delta=atol)
+
+    def test_val_array(self):
+        ts = np.linspace(start - 1, start + 5, 301)
+        for knots in [[1.0, 3.0], [3.0, 1.0], [1.0, 1.2]]:
+            traj = buildTrajectory("TrapezoidalVelocity", start, np.array(knots), {"vel_max": 1.0, "acc_max": 2.0})
+            for d in range(4):
+                expected = [traj.getVal(t, d) for t in ts]
+                np.testing.assert_allclose(traj.getValArray(ts, d), expected, atol=atol)
+
+
+class TestRobotTrajectory(unittest.TestCase):
+    def setUp(self):
+        self.model = RobotRRR()
+        targets = np.array([[0, 0.9, 0.0, 1.05], [2, 0.0, 0.9, 1.05], [4, 0.0, 0.8, 0.65]])
+        self.traj = RobotTrajectory(self.model, targets, "LinearSpline", "operational", "joint", start=1.5)
+
+    def test_operational_target(self):
+        for t in [1.5, 2.7, 4.2, 5.5]:
+            joints = [self.traj.getVal(t, dim, 0, "joint") for dim in range(3)]
+            expected = self.model.computeMGD(np.array(joints))
+            for dim in range(3):
+                self.assertAlmostEqual(self.traj.getVal(t, dim, 0, "operational"), expected[dim], delta=atol)
+
+    def test_joint_velocity(self):
+        targets = np.array([[0, 0.9, 0.0, 1.05], [2, 0.0, 0.9, 1.05], [4, 0.0, 0.8, 0.65]])
+        traj = RobotTrajectory(self.model, targets, "NaturalCubicSpline", "operational", "operational")
+        t = 1.3
+        joints_vel = traj.getJointVelocity(t)
+        J = self.model.computeJacobian(traj.getJointTarget(t))
+        np.testing.assert_allclose(J @ joints_vel, traj.getOperationalVelocity(t), atol=atol)
+
+    def test_stacked_splines(self):
+        targets = np.array([[0, 0.0, 0.3, 0.1], [2, 0.5, 0.2, -0.4], [3, 0.1, -0.3, 0.2], [4, 0.0, 0.3, 0.1]])
+        for type_name in ["LinearSpline", "NaturalCubicSpline", "PeriodicCubicSpline"]:
+            traj = RobotTrajectory(self.model, targets.copy(), type_name, "joint", "joint", start=1.5)
+            self.assertIsNotNone(traj.coeffs)
+            ts = np.array([0.5, 1.5, 2.2, 3.5, 5.5, 7.1])
+            for d in range(3):
+                values = traj.getPlanificationValArray(ts, d)
+                for i, t in enumerate(ts):
+                    expected = [spline.getVal(t, d) for spline in traj.trajectories]
+                    np.testing.assert_allclose(traj.getPlanificationVal(t, d), expected, atol=atol)
+                    np.testing.assert_allclose(values[:, i], expected, atol=atol)
+
+    def test_set_planification_vals(self):
+        # Conversions use the provided values rather than evaluating splines
+        t = 2.7
+        joints = np.array([0.1, 0.2, 0.3])
+        self.traj.setPlanificationVals(t, {0: joints})
+        expected = self.model.computeMGD(joints)
+        for dim in range(3):
+            self.assertAlmostEqual(self.traj.getVal(t, dim, 0, "operational"), expected[dim], delta=1e-12)
+
+    def test_iterative_mgi_fallback(self):
+        # Targets without analytical solution are solved from the previous one
+        class PartialRRR(RobotRRR):
+            def analyticalMGI(self, target):
+                if target[0] > 0.05:
+                    return 0, None
+                return super().analyticalMGI(target)
+        model = PartialRRR()
+        targets = np.array([[0, 0.0, 0.9, 1.05], [1, 0.1, 0.85, 1.05], [2, 0.15, 0.8, 1.0]])
+        traj = RobotTrajectory(model, targets.copy(), "LinearSpline", "operational", "joint")
+        for t, x, y, z in targets:
+            joints = [traj.getVal(t, dim, 0, "joint") for dim in range(3)]
+            np.testing.assert_allclose(model.computeMGD(np.array(joints)), [x, y, z], atol=1e-4)
+
+    def test_operational_velocity(self):
+        t = 2.7
+        joints = self.traj.getJointTarget(t)
+        joints_vel = self.traj.getJointVelocity(t)
+        expected = self.model.computeJacobian(joints) @ joints_vel
+        np.testing.assert_allclose(self.traj.getOperationalVelocity(t), expected, atol=atol)
+        # Alternating times should not reuse values of another time
+        self.traj.getOperationalVelocity(4.2)
+        np.testing.assert_allclose(self.traj.getOperationalVelocity(t), expected, atol=atol)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,43 +2,41 @@
 
 import numpy as np
 import json
+import sys
 import math
 import argparse
+import bisect
 from abc import abstractmethod
 import traceback
+from scipy import linalg
 
 import robots
 
 
 def buildTrajectory(type_name, start, knots, parameters=None):
-    if type_name == "ConstantSpline":
-        return ConstantSpline(knots, start)
-    if type_name == "LinearSpline":
-        return LinearSpline(knots, start)
-    if type_name == "CubicZeroDerivativeSpline":
-        return CubicZeroDerivativeSpline(knots, start)
-    if type_name == "CubicWideStencilSpline":
-        return CubicWideStencilSpline(knots, start)
-    if type_name == "CubicCustomDerivativeSpline":
-        return CubicCustomDerivativeSpline(knots, start)
-    if type_name == "NaturalCubicSpline":
-        return NaturalCubicSpline(knots, start)
-    if type_name == "PeriodicCubicSpline":
-        return PeriodicCubicSpline(knots, start)
-    if type_name == "TrapezoidalVelocity":
+    trajectory_class = _TRAJECTORIES.get(type_name)
+    if trajectory_class is None:
+        raise RuntimeError("Unknown type: {:}".format(type_name))
+    if trajectory_class is TrapezoidalVelocity:
         if parameters is None:
             raise RuntimeError("Parameters can't be None for TrapezoidalVelocity")
         return TrapezoidalVelocity(knots, parameters["vel_max"], parameters["acc_max"], start)
-    raise RuntimeError("Unknown type: {:}".format(type_name))
+    # Splines accept an optional 'dtype' parameter for their coefficients
+    dtype = np.double
+    if parameters is not None:
+        dtype = np.dtype(parameters.get("dtype", "float64"))
+    return trajectory_class(knots, start, dtype)
 
 
 def buildTrajectoryFromDictionary(dic):
-    return buildTrajectory(dic["type_name"], dic["start"], np.array(dic["knots"]), dic.get("parameters"))
+    return buildTrajectory(dic["type_name"], dic["start"], np.asarray(dic["knots"], dtype=np.double), dic.get("parameters"))
 
 
 def buildRobotTrajectoryFromDictionary(dic):
     model = robots.getRobotModel(dic["model_name"])
-    return RobotTrajectory(model, np.array(dic["targets"]), dic["trajectory_type"],
+    # targets are converted in place by RobotTrajectory, hence the copy
+    targets = np.array(dic["targets"], dtype=np.double)
+    return RobotTrajectory(model, targets, dic["trajectory_type"],
                            dic["target_space"], dic["planification_space"],
                            dic["start"], dic.get("parameters"))
 
@@ -94,6 +92,65 @@ class Trajectory:
             The value of derivative of degree d at time t.
         """
 
+    def getValArray(self, ts, d):
+        """
+        Computes the value of the derivative of order d at all the times in ts,
+        see getVal. Child classes can override it with a vectorized version.
+
+        Parameters
+        ----------
+        ts : np.ndarray shape(m,)
+            The times at which the values are requested
+        d : int >= 0
+            Order of the derivative
+
+        Returns
+        -------
+        x : np.ndarray shape(m,)
+            The value of derivative of degree d at each time of ts
+        """
+        return np.array([self.getVal(t, d) for t in ts], dtype=np.double)
+
+    def getVals(self, t, degrees):
+        """
+        Computes the values of several derivatives at time t, see getVal.
+        Child classes can override it to share the work done for t between
+        the degrees.
+
+        Parameters
+        ----------
+        t : float
+            The time at which the values are requested
+        degrees : list(int)
+            The orders of the derivatives requested
+
+        Returns
+        -------
+        x : tuple(float)
+            The value of the derivative of each degree at time t
+        """
+        return tuple(self.getVal(t, d) for d in degrees)
+
+    def getValsArray(self, ts, degrees):
+        """
+        Computes the values of several derivatives at all the times in ts, see
+        getValArray. Child classes can override it to share the work done for
+        each time between the degrees.
+
+        Parameters
+        ----------
+        ts : np.ndarray shape(m,)
+            The times at which the values are requested
+        degrees : list(int)
+            The orders of the derivatives requested
+
+        Returns
+        -------
+        x : np.ndarray shape(len(degrees),m)
+            The values of the derivative of each degree at each time of ts
+        """
+        return np.array([self.getValArray(ts, d) for d in degrees], dtype=np.double)
+
     def getStart(self):
         return self.start
 
@@ -101,6 +158,22 @@ class Trajectory:
         return self.end
 
 
+def _eval_cubic(c0, c1, c2, c3, u, d):
+    """
+    Evaluates the derivative of order d of c0 + c1 u + c2 u^2 + c3 u^3 with
+    Horner's rule, coefficients and u can either be floats or arrays
+    """
+    if d == 0:
+        return ((c3*u + c2)*u + c1)*u + c0
+    if d == 1:
+        return (3*c3*u + 2*c2)*u + c1
+    if d == 2:
+        return 6*c3*u + 2*c2
+    if d == 3:
+        return 6*c3 + 0*u
+    return 0*c3 + 0*u
+
+
 class Spline(Trajectory):
     """
     Attributes
@@ -111,24 +184,53 @@ class Spline(Trajectory):
         - Column 1 represents the position
         - Additional columns might be used to specify other elements
           (e.g derivative)
+    knot_times : np.ndarray shape (N,)
+        A contiguous copy of the time points of the knots
     coeffs : np.ndarray shape(N-1,K+1)
         A list of n-1 polynomials of degree $K$: The polynomial at slice $i$ is
         defined as follows: $S_i(t) = \\sum_{j=0}^{k}coeffs[i,j] * (t-t_i)^(k-j)$
     """
 
-    def __init__(self, knots, start=0):
+    def __init__(self, knots, start=0, dtype=np.double):
+        """
+        dtype is the type used to store coeffs, np.float32 halves the memory
+        used by large splines at the cost of precision
+        """
         super().__init__(start)
         self.knots = knots
         self.n = len(knots)
-        self.coeffs = np.zeros((self.n-1, 4))
-        self.end = self.knots[self.n-1, 0] + start
+        self.coeffs = np.zeros((self.n-1, 4), dtype=dtype)
         self.updatePolynomials()
+        self._updateCaches()
 
     @abstractmethod
     def updatePolynomials(self):
         """
-        Updates the polynomials based on the knots and the interpolation method
+        Updates the polynomials based on the knots and the interpolation method,
+        implementations only fill coeffs
+        """
+
+    def update(self):
+        """
+        Rebuilds the polynomials and the values used to evaluate the spline,
+        to be called after knots have been modified
+        """
+        self.updatePolynomials()
+        self._updateCaches()
+
+    def _updateCaches(self):
+        """
+        Rebuilds the values derived from knots and coeffs which are used to
+        evaluate the spline
         """
+        self.knot_times = np.ascontiguousarray(self.knots[:, 0], dtype=np.double)
+        self._knot_times_list = self.knot_times.tolist()
+        self.end = self.knot_times[-1] + self.start
+        self._bound_vals = (float(self.knots[0, 1]), float(self.knots[self.n-1, 1]))
+        self._coeffs_rows = [tuple(row) for row in self.coeffs.tolist()]
+        # One contiguous array per coefficient, gathering slices from them is
+        # cheaper than gathering rows of coeffs and reading strided columns
+        self._coeffs_columns = tuple(np.ascontiguousarray(self.coeffs.T))
 
     def getDegree(self):
         """
@@ -153,94 +255,116 @@ class Spline(Trajectory):
         p : np.ndarray shape(k+1,)
             The coefficients of the polynomial at time t, see coeffs
         """
-
-        t = t-self.start
-
-        for k in range(self.n-1):
-            if self.knots[k, 0] < t and self.knots[k+1, 0] > t:
-                adjusted_t = t-self.knots[k, 0]
-                p = self.coeffs[k]
-                return adjusted_t , p
-        return 0,0
+        # Same slice lookup as getVal
+        k, adjusted_t = self._locateSlice(float(t - self.start))
+        return adjusted_t, self.coeffs[k]
 
     def getVal(self, t, d=0):
         if t <= self.start:
             if d == 0:
-                return self.knots[0, 1]
+                return self._bound_vals[0]
             return 0
         elif t >= self.end:
             if d == 0:
-                return self.knots[self.n-1, 1]
+                return self._bound_vals[1]
             return 0
 
-        adjusted_t,p = self.getPolynomial(t)
-        p1 = p.copy()
-        
-        for _ in range(d):
-            p1[0] = p1[1]
-            p1[1] = p1[2]*2
-            p1[2] = p1[3]*3
-            p1[3] = 0
-        
-        value = p1[0] + adjusted_t * p1[1] + adjusted_t**2 * p1[2] + adjusted_t**3 * p1[3]
-        return value
+        k, u = self._locateSlice(float(t - self.start))
+        c0, c1, c2, c3 = self._coeffs_rows[k]
+        return _eval_cubic(c0, c1, c2, c3, u, d)
+
+    def getVals(self, t, degrees):
+        if t <= self.start or t >= self.end:
+            return tuple(self.getVal(t, d) for d in degrees)
+        # The slice is located once for all the degrees
+        k, u = self._locateSlice(float(t - self.start))
+        c0, c1, c2, c3 = self._coeffs_rows[k]
+        return tuple(_eval_cubic(c0, c1, c2, c3, u, d) for d in degrees)
+
+    def _locateSlice(self, t):
+        """
+        Returns the index of the slice containing t (relative to the start of
+        the spline) and t relative to the start of this slice. All the scalar
+        evaluations use this lookup, bisect on a list of Python floats is much
+        cheaper than a scalar searchsorted
+        """
+        # Searching between the second and the penultimate knots clamps the
+        # index to the first and the last slices
+        knot_times = self._knot_times_list
+        k = bisect.bisect_right(knot_times, t, 1, self.n-1) - 1
+        return k, t - knot_times[k]
+
+    def getValArray(self, ts, d=0):
+        return self.getValsArray(ts, [d])[0]
+
+    def getValsArray(self, ts, degrees):
+        # Slices and coefficients are gathered once for all the degrees
+        ts = np.asarray(ts, dtype=np.double)
+        u = ts - self.start
+        k = np.searchsorted(self.knot_times, u, side='right') - 1
+        k = np.clip(k, 0, self.n-2)
+        u = u - self.knot_times[k]
+        c0, c1, c2, c3 = (column[k] for column in self._coeffs_columns)
+        before = ts <= self.start
+        after = ts >= self.end
+        values = np.empty((len(degrees),) + ts.shape)
+        for i, d in enumerate(degrees):
+            values[i] = _eval_cubic(c0, c1, c2, c3, u, d)
+            values[i, before] = self.knots[0, 1] if d == 0 else 0
+            values[i, after] = self.knots[self.n-1, 1] if d == 0 else 0
+        return values
 
 
 
 class ConstantSpline(Spline):
     def updatePolynomials(self):
-        for i in range(self.n-1):
-            self.coeffs[i, 0] = self.knots[i, 1]
-            self.coeffs[i, 1] = 0
-            self.coeffs[i, 2] = 0
-            self.coeffs[i, 3] = 0
+        self.coeffs[:] = 0
+        self.coeffs[:, 0] = self.knots[:-1, 1]
 
 
 class LinearSpline(Spline):
     def updatePolynomials(self):
-        for i in range(self.n-1):
-            x0 = self.knots[i, 1]
-            x1 = self.knots[i+1, 1]
-            t0 = self.knots[i, 0]
-            t1 = self.knots[i+1, 0]
-            
-            self.coeffs[i, 0] = x0
-            self.coeffs[i, 1] = (x1 - x0) / (t1 - t0)
-            self.coeffs[i, 2] = 0
-            self.coeffs[i, 3] = 0
+        self.coeffs[:] = 0
+        self.coeffs[:, 0] = self.knots[:-1, 1]
+        self.coeffs[:, 1] = _slicesSlopes(self.knots)[2]
 
 
 
-class CubicZeroDerivativeSpline(Spline):
+def _slicesSlopes(knots):
     """
-    Update polynomials ensuring derivative is 0 at every knot.
+    Returns the duration h, its reciprocal inv_h and the mean slope of each
+    slice (shape(n-1,)). Reciprocals are computed once so that the spline
+    constructions multiply by them instead of dividing by h
     """
+    h = np.diff(knots[:, 0])
+    inv_h = 1 / h
+    slopes = np.diff(knots[:, 1]) * inv_h
+    return h, inv_h, slopes
 
-    def updatePolynomials(self):
-        for i in range(self.n-1):
-            x0 = self.knots[i, 1]
-            x1 = self.knots[i+1, 1]
-            t0 = self.knots[i, 0]
-            t1 = self.knots[i+1, 0]
-            
-            delta_t = t1-t0
-            A = np.array([
-                [0, 0, 0, 1],
-                [delta_t**3, delta_t**2, delta_t, 1],
-                [0, 0, 1, 0],
-                [3*delta_t**2, 2*delta_t, 1, 0]
-            ])
 
-            B = np.array([x0, x1, 0, 0])
+def _hermiteCoeffs(knots, v):
+    """
+    Returns the coefficients (shape(n-1,4)) of the cubic slices interpolating
+    the knots with derivatives v (shape(n,)) at the knots
+    """
+    h, inv_h, slopes = _slicesSlopes(knots)
+    v0 = v[:-1]
+    v1 = v[1:]
+    coeffs = np.empty((len(h), 4))
+    coeffs[:, 0] = knots[:-1, 1]
+    coeffs[:, 1] = v0
+    coeffs[:, 2] = (3 * slopes - 2 * v0 - v1) * inv_h
+    coeffs[:, 3] = (v0 + v1 - 2 * slopes) * (inv_h * inv_h)
+    return coeffs
 
-            solutions = np.linalg.solve(A, B)
 
-            self.coeffs[i, 0] = solutions[3]
-            self.coeffs[i, 1] = solutions[2]
-            self.coeffs[i, 2] = solutions[1]
-            self.coeffs[i, 3] = solutions[0]
-            # On a inversé l'ordre des solutions car on pensait que c'était
-            # a + bx + cx^2 + dx^3 alors que c'était ax^3 + bx^2 + cx + d
+class CubicZeroDerivativeSpline(Spline):
+    """
+    Update polynomials ensuring derivative is 0 at every knot.
+    """
+
+    def updatePolynomials(self):
+        self.coeffs[:] = _hermiteCoeffs(self.knots, np.zeros(self.n))
 
 
 
@@ -253,34 +377,16 @@ class CubicWideStencilSpline(Spline):
     def updatePolynomials(self):
         assert self.n >= 4
 
-        for i in range(self.n-1):
-            x,t = None, None
-            if i == 0:                    
-                x = self.knots[0:4, 1]
-                t = self.knots[0:4, 0]
-            elif i == self.n - 2:
-                x = self.knots[i-2:i+2, 1]
-                t = self.knots[i-2:i+2, 0]
-            else:
-                x = self.knots[i-1:i+3, 1]
-                t = self.knots[i-1:i+3, 0]
-            
-            t = t - self.knots[i, 0]
-
-            A = np.array([
-                [t[0]**3, t[0]**2, t[0], 1],
-                [t[1]**3, t[1]**2, t[1], 1],
-                [t[2]**3, t[2]**2, t[2], 1],
-                [t[3]**3, t[3]**2, t[3], 1],
-            ])
-            B = x
-
-            solutions = np.linalg.solve(A, B)
-
-            self.coeffs[i, 0] = solutions[3]
-            self.coeffs[i, 1] = solutions[2]
-            self.coeffs[i, 2] = solutions[1]
-            self.coeffs[i, 3] = solutions[0]
+        # Slice i is interpolated on the 4 knots starting at first[i]
+        first = np.arange(self.n-1) - 1
+        first[0] = 0
+        first[-1] = self.n - 4
+        stencil = first[:, None] + np.arange(4)
+        t = self.knots[stencil, 0] - self.knots[:-1, 0, None]
+        x = self.knots[stencil, 1]
+        # Vandermonde matrices with increasing powers, one per slice
+        A = t[:, :, None] ** np.arange(4)
+        self.coeffs[:] = np.linalg.solve(A, x[:, :, None])[:, :, 0]
 
 
 
@@ -291,73 +397,62 @@ class CubicCustomDerivativeSpline(Spline):
     """
     def updatePolynomials(self):
         assert self.knots.shape[1] >= 3
+        self.coeffs[:] = _hermiteCoeffs(self.knots, self.knots[:, 2])
 
-        for i in range(self.n-1):
-            x0 = self.knots[i, 1]
-            x1 = self.knots[i+1, 1]
-            t0 = self.knots[i, 0]
-            t1 = self.knots[i+1, 0]
-            v0 = self.knots[i, 2]
-            v1 = self.knots[i+1, 2]
-            
-            delta_t = t1-t0
-            A = np.array([
-                [0, 0, 0, 1],
-                [delta_t**3, delta_t**2, delta_t, 1],
-                [0, 0, 1, 0],
-                [3*delta_t**2, 2*delta_t, 1, 0]
-            ])
 
-            B = np.array([x0, x1, v0, v1])
+def _secondDerivativesSystem(knots):
+    """
+    Builds the tridiagonal system on the second derivatives M_i at the knots
+    of a cubic spline ensuring continuity of the first derivative at interior
+    knots: h_{i-1} M_{i-1} + 2 (h_{i-1} + h_i) M_i + h_i M_{i+1} = r_i
+
+    Returns
+    -------
+    h : np.ndarray shape(n-1,)
+        The duration of each slice
+    inv_h : np.ndarray shape(n-1,)
+        The reciprocal of h
+    slopes : np.ndarray shape(n-1,)
+        The mean slope of each slice
+    diag : np.ndarray shape(n-2,)
+        The diagonal for the interior knots
+    rhs : np.ndarray shape(n-2,)
+        The right hand side for the interior knots
+    """
+    h, inv_h, slopes = _slicesSlopes(knots)
+    diag = 2 * (h[:-1] + h[1:])
+    rhs = 6 * np.diff(slopes)
+    return h, inv_h, slopes, diag, rhs
 
-            solutions = np.linalg.solve(A, B)
 
-            self.coeffs[i, 0] = solutions[3]
-            self.coeffs[i, 1] = solutions[2]
-            self.coeffs[i, 2] = solutions[1]
-            self.coeffs[i, 3] = solutions[0]
+def _cubicCoeffsFromSecondDerivatives(knots, h, inv_h, slopes, M):
+    """
+    Returns the coefficients (shape(n-1,4)) of the cubic slices interpolating
+    the knots with second derivatives M (shape(n,)) at the knots
+    """
+    coeffs = np.empty((len(h), 4))
+    coeffs[:, 0] = knots[:-1, 1]
+    coeffs[:, 1] = slopes - h * (2 * M[:-1] + M[1:]) / 6
+    coeffs[:, 2] = M[:-1] / 2
+    coeffs[:, 3] = (M[1:] - M[:-1]) * inv_h / 6
+    return coeffs
 
 
 class NaturalCubicSpline(Spline):
     def updatePolynomials(self):
-        
-        A = np.zeros((4 * (self.n-1), 4 * (self.n-1)))
-        B = np.zeros(4 * (self.n-1))
-
-        for i in range(self.n-1):
-            x0 = self.knots[i, 1]
-            x1 = self.knots[i+1, 1]
-            t0 = self.knots[i, 0]
-            t1 = self.knots[i+1, 0]
-            
-            delta_t = t1-t0
-
-            start = 4*i
-            end = start + 4
-
-            A[start, start:end] = [0, 0, 0, 1]
-            A[start+1, start:end] = [delta_t**3, delta_t**2, delta_t, 1]
-            if i < self.n-2:
-                A[start+2, start:end] = [3*delta_t**2, 2*delta_t, 1, 0]
-                A[start+2, end:end+4] = [0, 0, -1, 0]
-                A[start+3, start:end] = [6*delta_t, 2, 0, 0]
-                A[start+3, end:end+4] = [0, -2, 0, 0]
-
-            B[4*i] = x0
-            B[4*i+1] = x1
-        
-        # contraintes supplémentaires
-        A[-2, 1] = 2
-        delta_t = self.knots[-1,0] - self.knots[-2,0]
-        A[-1, -4:-2] = [6*delta_t, 2]
-
-        coeffs = np.linalg.solve(A,B)
-
-        for i in range(self.n-1):
-            self.coeffs[i, 0] = coeffs[4*i+3]
-            self.coeffs[i, 1] = coeffs[4*i+2]
-            self.coeffs[i, 2] = coeffs[4*i+1]
-            self.coeffs[i, 3] = coeffs[4*i]
+        h, inv_h, slopes, diag, rhs = _secondDerivativesSystem(self.knots)
+        # Natural boundary conditions: M_0 = M_{n-1} = 0
+        M = np.zeros(self.n)
+        if self.n == 3:
+            M[1] = rhs[0] / diag[0]
+        elif self.n > 3:
+            # The system is symmetric and diagonally dominant, hence positive
+            # definite, only the upper band is provided
+            ab = np.zeros((2, self.n-2))
+            ab[0, 1:] = h[1:-1]
+            ab[1, :] = diag
+            M[1:-1] = linalg.solveh_banded(ab, rhs)
+        self.coeffs[:] = _cubicCoeffsFromSecondDerivatives(self.knots, h, inv_h, slopes, M)
 
 
 class PeriodicCubicSpline(Spline):
@@ -366,57 +461,57 @@ class PeriodicCubicSpline(Spline):
     derivative are always equal on both sides of a knot. This i
     """
     def updatePolynomials(self):
-        A = np.zeros((4 * (self.n-1), 4 * (self.n-1)))
-        B = np.zeros(4 * (self.n-1))
-
-        for i in range(self.n-1):
-            x0 = self.knots[i, 1]
-            x1 = self.knots[i+1, 1]
-            t0 = self.knots[i, 0]
-            t1 = self.knots[i+1, 0]
-            
-            delta_t = t1-t0
-
-            start = 4*i
-            end = start + 4
-
-            A[start, start:end] = [0, 0, 0, 1]
-            A[start+1, start:end] = [delta_t**3, delta_t**2, delta_t, 1]
-            if i < self.n-2:
-                A[start+2, start:end] = [3*delta_t**2, 2*delta_t, 1, 0]
-                A[start+2, end:end+4] = [0, 0, -1, 0]
-                A[start+3, start:end] = [6*delta_t, 2, 0, 0]
-                A[start+3, end:end+4] = [0, -2, 0, 0]
-
-            B[4*i] = x0
-            B[4*i+1] = x1
-        
-        # contraintes supplémentaires
-        delta_t = self.knots[-1,0] - self.knots[-2,0]
-        A[-2, 1] = 2
-        A[-2, -4:-2] = [-6*delta_t, -2]
-        A[-1, 2] = 1
-        A[-1, -4:] = [-3*delta_t**2, -2*delta_t, -1, 0]
-
-        coeffs = np.linalg.solve(A,B)
-
-        for i in range(self.n-1):
-            self.coeffs[i, 0] = coeffs[4*i+3]
-            self.coeffs[i, 1] = coeffs[4*i+2]
-            self.coeffs[i, 2] = coeffs[4*i+1]
-            self.coeffs[i, 3] = coeffs[4*i]
-
+        h, inv_h, slopes, diag, rhs = _secondDerivativesSystem(self.knots)
+        # Periodicity: M_{n-1} = M_0 and the first derivative at the end of the
+        # last slice equals the one at the start of the first slice, which
+        # closes the system on M_0..M_{n-2} into a cyclic tridiagonal one
+        m = self.n - 1
+        diag = np.concatenate(([2 * (h[-1] + h[0])], diag))
+        rhs = np.concatenate(([6 * (slopes[0] - slopes[-1])], rhs))
+        corner = h[-1]
+        if m < 3:
+            A = np.diag(diag)
+            for i in range(m):
+                A[i, (i+1) % m] += h[i]
+                A[(i+1) % m, i] += h[i]
+            M0 = np.linalg.solve(A, rhs)
+        else:
+            # Sherman-Morrison: A = B + u u^T / gamma with B tridiagonal, the
+            # choice gamma = -diag[0] keeps B symmetric positive definite
+            gamma = -diag[0]
+            ab = np.zeros((2, m))
+            ab[0, 1:] = h[:m-1]
+            ab[1, :] = diag
+            ab[1, 0] -= gamma
+            ab[1, -1] -= corner * corner / gamma
+            u = np.zeros(m)
+            u[0] = gamma
+            u[-1] = corner
+            yz = linalg.solveh_banded(ab, np.stack((rhs, u), axis=1))
+            y, z = yz[:, 0], yz[:, 1]
+            M0 = y - z * (y[0] + corner * y[-1] / gamma) / (1 + z[0] + corner * z[-1] / gamma)
+        M = np.append(M0, M0[0])
+        self.coeffs[:] = _cubicCoeffsFromSecondDerivatives(self.knots, h, inv_h, slopes, M)
 
     def getVal(self, t, d=0):
         D = self.end - self.start
         return super().getVal(self.start + (t-self.start)%D, d)
 
+    def getVals(self, t, degrees):
+        D = self.end - self.start
+        return super().getVals(self.start + (t-self.start)%D, degrees)
+
+    def getValsArray(self, ts, degrees):
+        D = self.end - self.start
+        return super().getValsArray(self.start + (np.asarray(ts)-self.start)%D, degrees)
+
 
 class TrapezoidalVelocity(Trajectory):
     def __init__(self, knots, vMax, accMax, start):
         super().__init__(start)
-        self.x_src = knots[0]
-        self.x_end = knots[1]
+        # Python floats are cheaper than numpy scalars in getVal
+        self.x_src = float(knots[0])
+        self.x_end = float(knots[1])
         self.D = self.x_end - self.x_src
         self.vMax = vMax
         self.accMax = accMax
@@ -424,11 +519,14 @@ class TrapezoidalVelocity(Trajectory):
         if abs(self.D) > (vMax*vMax) / accMax:
             self.Tacc = vMax / accMax
         else:
-            self.Tacc = np.sqrt(abs(self.D) / accMax)
+            self.Tacc = math.sqrt(abs(self.D) / accMax)
         
         self.Dacc = (self.accMax * self.Tacc * self.Tacc) / 2
 
         self.end = self.start + 2*self.Tacc + (abs(self.D) - 2*self.Dacc) / vMax
+        # Constants used at every evaluation
+        self.D_sign = math.copysign(1.0, self.D) if self.D != 0 else 0.0
+        self.T = self.end - self.start
 
     def getVal(self, t, d):
         if d < 0 or d > 2:
@@ -441,24 +539,48 @@ class TrapezoidalVelocity(Trajectory):
             if d == 0: return self.x_end
             return 0
 
-        D_sign = np.sign(self.D)
-        T = self.end - self.start
+        D_sign = self.D_sign
+        T = self.T
+        # Phases are defined relatively to the start of the trajectory
+        tau = t - self.start
 
-        if t <= self.Tacc:
-            if d == 0: return self.x_src + D_sign * (self.accMax*t*t)/2
-            if d == 1: return D_sign * self.accMax * t
+        if tau <= self.Tacc:
+            if d == 0: return self.x_src + D_sign * (self.accMax*tau*tau)/2
+            if d == 1: return D_sign * self.accMax * tau
             return D_sign * self.accMax
 
-        elif t > T - self.Tacc:
-            if d == 0: return self.x_end - D_sign * (self.accMax * (T-t) * (T-t))/2
-            if d == 1: return D_sign * self.accMax * (T-t)
+        elif tau > T - self.Tacc:
+            if d == 0: return self.x_end - D_sign * (self.accMax * (T-tau) * (T-tau))/2
+            if d == 1: return D_sign * self.accMax * (T-tau)
             return - D_sign * self.accMax
 
         else:
-            if d == 0: return self.x_src + D_sign * (self.Dacc + self.vMax * (t-self.Tacc))
+            if d == 0: return self.x_src + D_sign * (self.Dacc + self.vMax * (tau-self.Tacc))
             if d == 1: return D_sign * self.vMax
             return 0
-        
+
+    def getValArray(self, ts, d):
+        ts = np.asarray(ts, dtype=np.double)
+        if d < 0 or d > 2:
+            return np.zeros(ts.shape)
+        D_sign = self.D_sign
+        T = self.T
+        tau = ts - self.start
+        phases = [tau <= self.Tacc, tau > T - self.Tacc]
+        if d == 0:
+            choices = [self.x_src + D_sign * (self.accMax*tau*tau)/2,
+                       self.x_end - D_sign * (self.accMax * (T-tau) * (T-tau))/2]
+            cruise = self.x_src + D_sign * (self.Dacc + self.vMax * (tau-self.Tacc))
+        elif d == 1:
+            choices = [D_sign * self.accMax * tau, D_sign * self.accMax * (T-tau)]
+            cruise = D_sign * self.vMax
+        else:
+            choices = [D_sign * self.accMax, - D_sign * self.accMax]
+            cruise = 0
+        values = np.select(phases, choices, default=cruise)
+        values[ts < self.start] = self.x_src if d == 0 else 0
+        values[ts > self.end] = self.x_end if d == 0 else 0
+        return values
 
 
 class RobotTrajectory:
@@ -473,9 +595,14 @@ class RobotTrajectory:
         Two space in which trajectories are planified: 'operational' or 'joint'
     trajectories : list(Trajectory)
         One trajectory per dimension of the planification space
+    coeffs : np.ndarray shape(nb_dim,N-1,4) or None
+        The coefficients of all the trajectories when they are splines of the
+        same type sharing their knot times, None otherwise
     """
 
     supported_spaces = ["operational", "joint"]
+    # Distance to the target under which an iterative MGI solution is accepted
+    mgi_tol = 1e-4
 
     def __init__(self, model, targets, trajectory_type,
                  target_space, planification_space,
@@ -507,6 +634,10 @@ class RobotTrajectory:
         self.trajectories = []
         self.start = start
         self.end = start
+        self._memo_t = None
+        self._memo = {}
+        # Last joint target converted, used to warm start the next conversion
+        self._last_joint_target = None
 
         target_len, target_dim = targets.shape
 
@@ -520,29 +651,51 @@ class RobotTrajectory:
             time_info = True
 
         if target_space != self.planification_space:
-            for i in range(target_len):
-                begin = 1 if time_info else 0
-                target = targets[i, begin:]
-                if planification_space == "joint":
-                    targets[i, begin:] = self.model.analyticalMGI(target)[1]
-                else:
-                    targets[i, begin:] = self.model.computeMGD(target)
+            begin = 1 if time_info else 0
+            space_targets = targets[:, begin:]
+            if planification_space == "joint":
+                # Targets are converted in order, each one warm starting the
+                # next, repeated targets (e.g. pauses) are only converted once
+                converted = {}
+                last_joints = None
+                for i, target in enumerate(space_targets):
+                    key = target.tobytes()
+                    if key not in converted:
+                        converted[key] = self._computeMGI(target, last_joints)
+                    last_joints = converted[key]
+                    targets[i, begin:] = last_joints
+            else:
+                targets[:, begin:] = self.model.computeMGDBatch(space_targets)
         
         # Pour chaque dimension, on calcule la trajectoire qu'on ajoute à la liste des trajectoires
         # Si nécessaire, on met aussi à jour self.end
+        if time_info:
+            # The knots of all dimensions are built in a single array, each
+            # trajectory receives a view on its own (target_len, 2) slice
+            all_knots = np.empty((self.nb_dim, target_len, 2))
+            all_knots[:, :, 0] = targets[:, 0]
+            all_knots[:, :, 1] = targets[:, 1:].T
         for i in range(self.nb_dim):
             if time_info:
-                knots = np.zeros((target_len, 2))
-                knots[:, 0] = targets[:, 0]
-                knots[:, 1] = targets[:, i+1]
-            else:            
+                knots = all_knots[i]
+            else:
                 knots = targets[:, i]
-                
+
             traj = buildTrajectory(trajectory_type, start, knots, parameters)
             self.trajectories.append(traj)
             if traj.getEnd() > self.end:
                 self.end = traj.getEnd()
-        
+
+        # Splines built from the same targets share their knot times, their
+        # coefficients are stacked to evaluate all dimensions at once
+        self.coeffs = None
+        first = self.trajectories[0]
+        if isinstance(first, Spline) and all(
+                type(traj) is type(first) and np.array_equal(traj.knot_times, first.knot_times)
+                for traj in self.trajectories):
+            self.coeffs = np.stack([traj.coeffs for traj in self.trajectories])
+            self._start_vals = np.array([traj.knots[0, 1] for traj in self.trajectories])
+            self._end_vals = np.array([traj.knots[-1, 1] for traj in self.trajectories])
 
 
     def getVal(self, t, dim, degree, space):
@@ -566,18 +719,22 @@ class RobotTrajectory:
         """
 
         if space == self.planification_space:
-            return self.trajectories[dim].getVal(t, degree)
-        
-        value = None
-        if space == "operational":            
-            if degree == 0: value = self.getOperationalTarget(t)
-            elif degree == 1: value = self.getOperationalVelocity(t)
-            elif degree == 2: value = self.getOperationalAcc(t)
-        elif space == "joint":
-            if degree == 0: value = self.getJointTarget(t)
-            elif degree == 1: value = self.getJointVelocity(t)
-            elif degree == 2: value = self.getJointAcc(t)
+            return self.getPlanificationVal(t, degree)[dim]
         
+        def compute():
+            if space == "operational":
+                if degree == 0: return self.getOperationalTarget(t)
+                elif degree == 1: return self.getOperationalVelocity(t)
+                elif degree == 2: return self.getOperationalAcc(t)
+            elif space == "joint":
+                if degree == 0: return self.getJointTarget(t)
+                elif degree == 1: return self.getJointVelocity(t)
+                elif degree == 2: return self.getJointAcc(t)
+            return None
+
+        # All dimensions are converted at once, the result is reused for the
+        # other dimensions requested at the same time
+        value = self._memoized(t, (space, degree), compute)
         if value is not None:
             return value[dim]
         return None
@@ -585,10 +742,85 @@ class RobotTrajectory:
 
 
     def getPlanificationVal(self, t, degree):
-        value = []
-        for i in range(len(self.trajectories)):
-            value.append(self.trajectories[i].getVal(t, degree))
-        return value
+        """
+        Returns the values of all the dimensions of the planification space.
+        Values are memoized for the last time requested, since all dimensions
+        and spaces are usually requested for the same t. The returned array is
+        read-only.
+        """
+        def compute():
+            if self.coeffs is None:
+                return np.array([traj.getVal(t, degree) for traj in self.trajectories], dtype=np.double)
+            return self._getStackedSplinesVal(t, degree)
+        return self._memoized(t, ("planification", degree), compute)
+
+    def setPlanificationVals(self, t, values):
+        """
+        Provides the values of the planification space at time t, e.g. taken
+        from getPlanificationValArray, conversions to the other space at time t
+        then reuse them instead of evaluating the trajectories again
+
+        Parameters
+        ----------
+        t : float
+            The time of the values
+        values : dict
+            For each degree of derivative, the values of all the dimensions of
+            the planification space
+        """
+        for degree, value in values.items():
+            self._memoized(t, ("planification", degree), lambda: value)
+
+    def getPlanificationValArray(self, ts, degree):
+        """
+        Parameters
+        ----------
+        ts : np.ndarray shape(m,)
+            The times at which the values are requested
+        degree : int
+            The degree of the derivative requested (0 means position)
+
+        Returns
+        -------
+        values : np.ndarray shape(nb_dim,m)
+            The values of all the dimensions of the planification space at
+            each time of ts
+        """
+        return np.array([traj.getValArray(ts, degree) for traj in self.trajectories], dtype=np.double)
+
+    def _memoized(self, t, key, compute):
+        """
+        Returns the result of compute() for the given key, results are stored
+        as read-only arrays until another time is requested
+        """
+        if t != self._memo_t:
+            self._memo_t = t
+            self._memo = {}
+        if key not in self._memo:
+            value = compute()
+            if value is not None:
+                value = np.array(value, dtype=np.double)
+                value.flags.writeable = False
+            self._memo[key] = value
+        return self._memo[key]
+
+    def getJacobian(self, t):
+        """
+        Returns the jacobian of the model at the joint target of time t
+        """
+        return self._memoized(t, "jacobian", lambda: self.model.computeJacobian(self.getJointTarget(t)))
+
+    def _getStackedSplinesVal(self, t, degree):
+        first = self.trajectories[0]
+        if isinstance(first, PeriodicCubicSpline):
+            t = first.start + (t - first.start) % (first.end - first.start)
+        if t <= first.start:
+            return self._start_vals.copy() if degree == 0 else np.zeros(len(self.trajectories))
+        if t >= first.end:
+            return self._end_vals.copy() if degree == 0 else np.zeros(len(self.trajectories))
+        k, u = first._locateSlice(float(t - first.start))
+        c = self.coeffs[:, k]
+        return np.array(_eval_cubic(c[:, 0], c[:, 1], c[:, 2], c[:, 3], u, degree), dtype=np.double)
 
     def getOperationalTarget(self, t):
         value = self.getPlanificationVal(t, 0)
@@ -600,19 +832,50 @@ class RobotTrajectory:
         value = self.getPlanificationVal(t, 0)
         if self.planification_space == "joint":
             return value
-        return self.model.analyticalMGI(value)[1]
+        def compute():
+            joints = self._computeMGI(value, self._last_joint_target)
+            if joints is not None:
+                self._last_joint_target = joints
+            return joints
+        return self._memoized(t, "joint_target", compute)
+
+    def _computeMGI(self, target, last_joints):
+        """
+        Returns the joints reaching the operational target, None if none is
+        found. When the analytical MGI fails, the iterative MGI is warm started
+        from last_joints, the solution of a previous, usually close, target
+        """
+        joints = self.model.analyticalMGI(target)[1]
+        if joints is None and last_joints is not None:
+            joints = self.model.computeMGI(last_joints, target, "jacobianInverse",
+                                           warm_start=True, last_joints=last_joints)
+            # The iterative MGI ignores joints limits, e.g. RobotRT would reach
+            # targets too close to its base with a negative translation
+            limits = self.model.getJointsLimits()
+            error = target - self.model.computeMGD(joints)
+            if (math.sqrt(error @ error) > self.mgi_tol or
+                    np.any(joints < limits[:, 0]) or np.any(joints > limits[:, 1])):
+                return None
+        return joints
 
     def getOperationalVelocity(self, t):
         value = self.getPlanificationVal(t, 1)
         if self.planification_space == "operational":
             return value
-        return self.model.computeJacobian(self.getJointTarget(t)) @ value
+        return self.getJacobian(t) @ value
 
     def getJointVelocity(self, t):
         value = self.getPlanificationVal(t, 1)
         if self.planification_space == "joint":
             return value        
-        return np.linalg.pinv(self.model.computeJacobian(self.getJointTarget(t))) @ value
+        J = self.getJacobian(t)
+        if J.shape[0] == J.shape[1]:
+            try:
+                return np.linalg.solve(J, value)
+            except np.linalg.LinAlgError:
+                # Singular configuration, use the least-squares solution
+                pass
+        return np.linalg.lstsq(J, value, rcond=None)[0]
 
     def getOperationalAcc(self, t):
         value = self.getPlanificationVal(t, 2)
@@ -633,6 +896,18 @@ class RobotTrajectory:
         return self.end
 
 
+_TRAJECTORIES = {
+    "ConstantSpline": ConstantSpline,
+    "LinearSpline": LinearSpline,
+    "CubicZeroDerivativeSpline": CubicZeroDerivativeSpline,
+    "CubicWideStencilSpline": CubicWideStencilSpline,
+    "CubicCustomDerivativeSpline": CubicCustomDerivativeSpline,
+    "NaturalCubicSpline": NaturalCubicSpline,
+    "PeriodicCubicSpline": PeriodicCubicSpline,
+    "TrapezoidalVelocity": TrapezoidalVelocity,
+}
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--dt", type=float, default=0.02)
@@ -660,21 +935,49 @@ if __name__ == "__main__":
             print("Error while building trajectory from file {:}:\n{:}".format(t.name, traceback.format_exc()))
             exit()
     order_names = ["position", "velocity", "acceleration", "jerk"]
+    row_format = "{:}, {:}, {:}, {:}, {:}\n"
+    # Rows are written by chunks rather than printed one by one
+    rows = []
+    rows_per_write = 4096
+
+    def writeRows():
+        sys.stdout.write("".join(rows))
+        rows.clear()
+
     print("source,t,order,variable,value")
-    for source_name, trajectory in trajectories.items():
-        for t in np.arange(tmin - args.margin, tmax + args.margin, args.dt):
-            for degree in args.degrees:
-                order_name = order_names[degree]
-                if (args.robot):
-                    space_dims = {
-                        "joint": trajectory.model.getJointsNames(),
-                        "operational": trajectory.model.getOperationalDimensionNames()
-                    }
-                    for space, dim_names in space_dims.items():
-                        for dim in range(len(dim_names)):
-                            v = trajectory.getVal(t, dim, degree, space)
-                            if v is not None:
-                                print("{:}, {:}, {:}, {:}, {:}".format(source_name, t, order_name, dim_names[dim], v))
-                else:
-                    v = trajectory.getVal(t, degree)
-                    print("{:}, {:}, {:}, {:}, {:}".format(source_name, t, order_name, "x", v))
+    ts = np.arange(tmin - args.margin, tmax + args.margin, args.dt)
+    try:
+        for source_name, trajectory in trajectories.items():
+            # Values which do not require a conversion are evaluated at once
+            if args.robot:
+                values = {degree: trajectory.getPlanificationValArray(ts, degree) for degree in args.degrees}
+                # Dimension names do not depend on time
+                space_dims = {
+                    "joint": list(enumerate(trajectory.model.getJointsNames())),
+                    "operational": list(enumerate(trajectory.model.getOperationalDimensionNames()))
+                }
+            else:
+                values = dict(zip(args.degrees, trajectory.getValsArray(ts, args.degrees)))
+            for i, t in enumerate(ts):
+                if args.robot:
+                    # Conversions reuse the values computed above
+                    trajectory.setPlanificationVals(t, {degree: values[degree][:, i] for degree in args.degrees})
+                for degree in args.degrees:
+                    order_name = order_names[degree]
+                    if (args.robot):
+                        for space, dims in space_dims.items():
+                            for dim, dim_name in dims:
+                                if space == trajectory.planification_space:
+                                    v = values[degree][dim, i]
+                                else:
+                                    v = trajectory.getVal(t, dim, degree, space)
+                                if v is not None:
+                                    rows.append(row_format.format(source_name, t, order_name, dim_name, v))
+                    else:
+                        v = values[degree][i]
+                        rows.append(row_format.format(source_name, t, order_name, "x", v))
+                if len(rows) >= rows_per_write:
+                    writeRows()
+    finally:
+        # Rows computed before an error are still written
+        writeRows()